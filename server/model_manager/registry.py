@@ -131,8 +131,32 @@ def initialize_registry():
         save_registry(default_registry)
 
 
+# Text of the last registry read, keyed by the file's (inode, mtime, size). Every /generate and
+# status request reads the registry, usually several times; while the file is unchanged the
+# validation pass and the reads are skipped and only the JSON is parsed into a fresh dict.
+_registry_cache = (None, None)
+
+
+def _registry_file_stamp(stat_result):
+    return (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+
+
 def get_registry():
     """Get the current models registry."""
+    stamp, text = _registry_cache
+    if stamp is not None:
+        try:
+            if _registry_file_stamp(os.stat(MODELS_REGISTRY_FILE)) == stamp:
+                return json.loads(text)
+        except OSError:
+            pass
+
+    return _read_registry()
+
+
+def _read_registry():
+    """Validate and read the registry file, remembering its text for get_registry."""
+    global _registry_cache
     initialize_registry() # Ensure it's initialized and valid before reading
 
     max_retries = 3
@@ -141,7 +165,11 @@ def get_registry():
     for attempt in range(max_retries):
         try:
             with open(MODELS_REGISTRY_FILE, 'r') as f:
-                return json.load(f)
+                text = f.read()
+                stamp = _registry_file_stamp(os.fstat(f.fileno()))
+            registry = json.loads(text)
+            _registry_cache = (stamp, text)
+            return registry
         except PermissionError as e:
             logger.warning(f"Permission error reading registry (attempt {attempt+1}/{max_retries}): {e}")
             # Wait before retrying
@@ -1,6 +1,7 @@
 import os
 import sys
 import logging
+import signal
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 
@@ -18,6 +19,10 @@ logging.getLogger('werkzeug').setLevel(logging.WARNING)
 
 # Create Flask app
 app = Flask(__name__)
+# Behind a front server that honours X-Sendfile (Apache mod_xsendfile, lighttpd), let it push
+# audio files with sendfile(2) instead of streaming them through Python. Off by default since
+# the dev server would otherwise send empty bodies.
+app.use_x_sendfile = os.environ.get('NARRATION_USE_X_SENDFILE', '').lower() in ('1', 'true')
 # Configure CORS using centralized configuration
 flask_cors_config = get_flask_cors_config()
 CORS(app, resources={r"/*": flask_cors_config}, allow_headers=flask_cors_config['allow_headers'])
@@ -89,8 +94,24 @@ if __name__ == '__main__':
     try:
         logger.info(f"Starting F5-TTS Narration Service on port {port}")
 
-        # Start the server on the specified port
-        app.run(host='0.0.0.0', port=port, debug=False)
+        # Announce a proxy offload mode when one is configured; the default stays quiet
+        if app.use_x_sendfile:
+            logger.info("Audio files are handed to the front server via X-Sendfile")
+        elif os.environ.get('NARRATION_X_ACCEL_PREFIX'):
+            logger.info("Audio files are handed to nginx via X-Accel-Redirect")
+        else:
+            logger.debug("Audio files are streamed by this process; behind a proxy, set "
+                        "NARRATION_X_ACCEL_PREFIX or NARRATION_USE_X_SENDFILE to use sendfile(2)")
+
+        # A static Gemini key snapshot is re-read on SIGHUP (registered here, on the main thread,
+        # rather than when the module is imported)
+        from narration_service import narration_gemini
+        if narration_gemini.KEYS_STATIC and hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, lambda signum, frame: narration_gemini.reload_keys())
+
+        # Start the server on the specified port. Threaded so concurrent uploads overlap their
+        # ffmpeg/disk waits instead of queueing behind one another.
+        app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
 
     except OSError as e:
         logger.error(f"Failed to start server on port {port}: {e}")
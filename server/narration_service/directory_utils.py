@@ -3,13 +3,48 @@ Utility functions for managing narration directories in the Python service
 """
 
 import os
+import time
 import logging
+import threading
+from collections import OrderedDict
 
 # Import configuration
 from .narration_config import OUTPUT_AUDIO_DIR
 
 logger = logging.getLogger(__name__)
 
+# Short-lived negative cache for /audio lookups that 404, so a client polling for a file that
+# doesn't exist yet costs one dict lookup instead of stats across both audio dirs.
+# Cleared whenever narration audio is written.
+_MISSING_AUDIO_TTL = 2.0
+_MISSING_AUDIO_MAX = 1024
+_missing_audio = OrderedDict()
+_missing_audio_lock = threading.Lock()
+
+def is_audio_known_missing(filename):
+    """Return True if filename was looked up and not found within the last few seconds"""
+    with _missing_audio_lock:
+        missed_at = _missing_audio.get(filename)
+        if missed_at is None:
+            return False
+        if time.monotonic() - missed_at > _MISSING_AUDIO_TTL:
+            del _missing_audio[filename]
+            return False
+        return True
+
+def mark_audio_missing(filename):
+    """Remember that filename was not found in the audio directories"""
+    with _missing_audio_lock:
+        _missing_audio[filename] = time.monotonic()
+        _missing_audio.move_to_end(filename)
+        while len(_missing_audio) > _MISSING_AUDIO_MAX:
+            _missing_audio.popitem(last=False)
+
+def clear_missing_audio():
+    """Forget all cached misses; call after writing new narration audio"""
+    with _missing_audio_lock:
+        _missing_audio.clear()
+
 def get_subtitle_directory(subtitle_id):
     """
     Get the directory path for a specific subtitle ID
@@ -53,3 +88,25 @@ def get_next_file_number(subtitle_dir):
         
     existing_files = os.listdir(subtitle_dir)
     return len(existing_files) + 1
+
+def allocate_subtitle_outputs(subtitle_ids):
+    """
+    Create the directories for a run of subtitles and pick the next file number in each, in one pass
+
+    Args:
+        subtitle_ids: The subtitle IDs that will receive audio
+
+    Returns:
+        dict: subtitle ID -> (subtitle directory, next file number)
+    """
+    os.makedirs(OUTPUT_AUDIO_DIR, exist_ok=True)
+    outputs = {}
+    for subtitle_id in subtitle_ids:
+        subtitle_dir = get_subtitle_directory(subtitle_id)
+        try:
+            # A directory created just now is empty, so there is nothing to list
+            os.mkdir(subtitle_dir)
+            outputs[subtitle_id] = (subtitle_dir, 1)
+        except FileExistsError:
+            outputs[subtitle_id] = (subtitle_dir, len(os.listdir(subtitle_dir)) + 1)
+    return outputs
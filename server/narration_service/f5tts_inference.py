@@ -0,0 +1,227 @@
+"""
+Inference helpers that reuse one preprocessed reference clip across a request: reference
+preparation, single-text inference and batched inference with one padded model.sample call.
+"""
+
+from collections import namedtuple
+
+import torch
+import numpy as np
+
+# Mel spectrogram types F5-TTS ships a vocoder for
+_VOCODER_TYPES = ("vocos", "bigvgan")
+
+
+def trim_leading_silence(audio, sr, threshold=0.01):
+    """Trim leading silence from audio array using a simple threshold."""
+    # Convert to float if not already
+    if audio.dtype != np.float32:
+        audio = audio.astype(np.float32)
+
+    # Find the first sample above the threshold
+    above_threshold = np.abs(audio) > threshold
+    if np.any(above_threshold):
+        start_idx = np.argmax(above_threshold)
+        return audio[start_idx:]
+    return audio
+
+
+def estimate_duration(ref_audio_len, ref_text, gen_text, speed, fix_duration, target_sample_rate, hop_length):
+    """Total mel frames (reference + generated) to sample for gen_text."""
+    if fix_duration is not None:
+        return int(fix_duration * target_sample_rate / hop_length)
+
+    # Calculate duration using character length instead of byte length
+    ref_text_len = len(ref_text)
+    gen_text_len = len(gen_text)
+    multiplier = 3.0 if gen_text_len < 20 else 1.5
+    if gen_text_len < 5:
+        multiplier = 5.0  # Increase multiplier for very short texts
+    duration = ref_audio_len + int(ref_audio_len / ref_text_len * gen_text_len / speed * multiplier)
+
+    # Ensure minimum generated duration for short texts
+    generated_frames = duration - ref_audio_len
+    min_generated_frames = 150  # ~1 second at typical hop_length
+    if generated_frames < min_generated_frames:
+        duration = ref_audio_len + min_generated_frames
+    return duration
+
+
+# Reference audio after F5-TTS preprocessing (clipped, silence-trimmed, mono) plus its final text
+PreparedReference = namedtuple("PreparedReference", ["audio", "sr", "ref_text"])
+
+
+def prepare_reference(ref_file, ref_text):
+    """
+    Run F5-TTS reference preprocessing once (clip/trim, transcription when ref_text is empty)
+    and load the result, so every subtitle in a request can reuse it.
+    """
+    from f5_tts.infer import utils_infer
+
+    ref_file, ref_text = utils_infer.preprocess_ref_audio_text(ref_file, ref_text)
+    audio, sr = utils_infer.torchaudio.load(ref_file)
+    if audio.shape[0] > 1:
+        audio = torch.mean(audio, dim=0, keepdim=True)
+    return PreparedReference(audio, sr, ref_text)
+
+
+def _max_chunk_chars(reference, speed):
+    """Per-chunk text budget used by infer_process; longer texts are chunked and cross-faded."""
+    ref_seconds = reference.audio.shape[-1] / reference.sr
+    return int(len(reference.ref_text) / ref_seconds * (22 - ref_seconds) * speed)
+
+
+def _sampling_autocast_dtype(tts):
+    """
+    Autocast dtype for model.sample, or None to run as loaded. F5-TTS already loads weights in
+    fp16 on sm_70+ GPUs, so this only kicks in for fp32 checkpoints on tensor-core GPUs:
+    bf16 on sm_80+ (Ampere/Hopper), fp16 on Volta/Turing.
+    """
+    if not str(tts.device).startswith("cuda") or not torch.cuda.is_available():
+        return None
+    if next(tts.ema_model.parameters()).dtype != torch.float32:
+        return None
+    major, _ = torch.cuda.get_device_capability(tts.device)
+    if major >= 8:
+        return torch.bfloat16
+    if major >= 7:
+        return torch.float16
+    return None
+
+
+def infer_single(
+    tts,
+    reference,
+    gen_text,
+    target_rms=0.1,
+    cross_fade_duration=0.15,
+    sway_sampling_coef=-1,
+    cfg_strength=2,
+    nfe_step=32,
+    speed=1.0,
+    fix_duration=None,
+    seed=None,
+):
+    """
+    Equivalent of F5TTS.infer that reuses a PreparedReference and returns the wave instead
+    of writing it; save it with tts.export_wav(wave, file_wave, remove_silence).
+    """
+    from f5_tts.infer import utils_infer
+    from f5_tts.model.utils import seed_everything
+
+    if seed is not None:
+        seed_everything(seed)
+
+    gen_text_batches = utils_infer.chunk_text(gen_text, max_chars=_max_chunk_chars(reference, speed))
+    wave, _, _ = next(
+        utils_infer.infer_batch_process(
+            (reference.audio, reference.sr),
+            reference.ref_text,
+            gen_text_batches,
+            tts.ema_model,
+            tts.vocoder,
+            mel_spec_type=tts.mel_spec_type,
+            target_rms=target_rms,
+            cross_fade_duration=cross_fade_duration,
+            nfe_step=nfe_step,
+            cfg_strength=cfg_strength,
+            sway_sampling_coef=sway_sampling_coef,
+            speed=speed,
+            fix_duration=fix_duration,
+            device=tts.device,
+        )
+    )
+    return wave
+
+
+def infer_batch(
+    tts,
+    reference,
+    gen_texts,
+    target_rms=0.1,
+    sway_sampling_coef=-1,
+    cfg_strength=2,
+    nfe_step=32,
+    speed=1.0,
+    fix_duration=None,
+    seed=None,
+):
+    """
+    Generate several texts against the same PreparedReference with one padded model.sample call.
+    Returns one wave per text, in order. Texts too long for a single chunk go through
+    infer_single one at a time.
+
+    seed applies per text, not per batch: model.sample reseeds before drawing each row's
+    noise, so every text starts from the noise infer_single would use with that seed, no
+    matter which batch or position it lands in.
+    """
+    from f5_tts.infer import utils_infer
+
+    if tts.mel_spec_type not in _VOCODER_TYPES:
+        raise ValueError(f"Unsupported mel_spec_type {tts.mel_spec_type!r}; expected 'vocos' or 'bigvgan'")
+
+    max_chars = _max_chunk_chars(reference, speed)
+    waves = [None] * len(gen_texts)
+    batch = []
+    for i, gen_text in enumerate(gen_texts):
+        if len(gen_text) > max_chars:
+            waves[i] = infer_single(
+                tts, reference, gen_text, target_rms=target_rms, sway_sampling_coef=sway_sampling_coef,
+                cfg_strength=cfg_strength, nfe_step=nfe_step, speed=speed, fix_duration=fix_duration,
+                seed=seed,
+            )
+        else:
+            batch.append((i, gen_text))
+    if not batch:
+        return waves
+
+    audio, sr, ref_text = reference
+    rms = torch.sqrt(torch.mean(torch.square(audio)))
+    if rms < target_rms:
+        audio = audio * target_rms / rms
+    if sr != tts.target_sample_rate:
+        audio = utils_infer.torchaudio.transforms.Resample(sr, tts.target_sample_rate)(audio)
+    audio = audio.to(tts.device)
+
+    if len(ref_text[-1].encode("utf-8")) == 1:
+        ref_text = ref_text + " "
+
+    ref_audio_len = audio.shape[-1] // utils_infer.hop_length
+    durations = [
+        estimate_duration(
+            ref_audio_len, ref_text, gen_text, speed, fix_duration, tts.target_sample_rate, utils_infer.hop_length
+        )
+        for _, gen_text in batch
+    ]
+    text_list = utils_infer.convert_char_to_pinyin([ref_text + gen_text for _, gen_text in batch])
+
+    autocast_dtype = _sampling_autocast_dtype(tts)
+    with torch.inference_mode():
+        # Reduced precision covers only the diffusion sampling; the vocoder below runs in fp32
+        with torch.autocast(
+            device_type="cuda", dtype=autocast_dtype or torch.float16, enabled=autocast_dtype is not None
+        ):
+            # One row per text; the model pads text and duration across the batch and masks the tail
+            generated, _ = tts.ema_model.sample(
+                cond=audio.repeat(len(batch), 1),
+                text=text_list,
+                duration=torch.tensor(durations, dtype=torch.long, device=audio.device),
+                steps=nfe_step,
+                cfg_strength=cfg_strength,
+                sway_sampling_coef=sway_sampling_coef,
+                seed=seed,
+            )
+        del _
+        generated = generated.to(torch.float32)
+
+        for row, ((i, _), duration) in enumerate(zip(batch, durations)):
+            mel = generated[row:row + 1, ref_audio_len:duration, :].permute(0, 2, 1)
+            if tts.mel_spec_type == "vocos":
+                wave = tts.vocoder.decode(mel)
+            else:
+                wave = tts.vocoder(mel)  # bigvgan
+            if rms < target_rms:
+                wave = wave * rms / target_rms
+            waves[i] = trim_leading_silence(wave.squeeze().cpu().numpy(), tts.target_sample_rate)
+
+    return waves
@@ -14,6 +14,8 @@ from hydra.utils import get_class
 import torch
 import numpy as np
 
+from .f5tts_inference import estimate_duration, trim_leading_silence
+
 # F5-TTS is now installed as a package, no need to manipulate sys.path
 
 # Lazy imports - these will be imported when needed
@@ -56,20 +58,6 @@ def seed_everything(*args, **kwargs):
     _lazy_import_f5tts()
     _seed_everything(*args, **kwargs)
 
-def trim_leading_silence(audio, sr, threshold=0.01):
-    """Trim leading silence from audio array using a simple threshold."""
-    # Convert to float if not already
-    if audio.dtype != np.float32:
-        audio = audio.astype(np.float32)
-
-    # Find the first sample above the threshold
-    above_threshold = np.abs(audio) > threshold
-    if np.any(above_threshold):
-        start_idx = np.argmax(above_threshold)
-        return audio[start_idx:]
-    return audio
-
-
 class PatchedF5TTS:
     """
     Patched version of F5TTS that supports custom config_dict parameter.
@@ -398,22 +386,10 @@ def patch_utils_infer():
             final_text_list = utils_infer.convert_char_to_pinyin(text_list)
 
             ref_audio_len = audio.shape[-1] // utils_infer.hop_length
-            if fix_duration is not None:
-                duration = int(fix_duration * utils_infer.target_sample_rate / utils_infer.hop_length)
-            else:
-                # Calculate duration using character length instead of byte length
-                ref_text_len = len(ref_text)
-                gen_text_len = len(gen_text)
-                multiplier = 3.0 if gen_text_len < 20 else 1.5
-                if gen_text_len < 5:
-                    multiplier = 5.0  # Increase multiplier for very short texts
-                duration = ref_audio_len + int(ref_audio_len / ref_text_len * gen_text_len / local_speed * multiplier)
-
-                # Ensure minimum generated duration for short texts
-                generated_frames = duration - ref_audio_len
-                min_generated_frames = 150  # ~1 second at typical hop_length
-                if generated_frames < min_generated_frames:
-                    duration = ref_audio_len + min_generated_frames
+            duration = estimate_duration(
+                ref_audio_len, ref_text, gen_text, local_speed, fix_duration,
+                utils_infer.target_sample_rate, utils_infer.hop_length
+            )
 
             # inference
             with torch.inference_mode():
@@ -434,6 +410,8 @@ def patch_utils_infer():
                     generated_wave = vocoder.decode(generated)
                 elif mel_spec_type == "bigvgan":
                     generated_wave = vocoder(generated)
+                else:
+                    raise ValueError(f"Unsupported mel_spec_type {mel_spec_type!r}; expected 'vocos' or 'bigvgan'")
                 if rms < target_rms:
                     generated_wave = generated_wave * rms / target_rms
 
@@ -1,18 +1,18 @@
 import os
-import uuid
+import secrets
 import base64
 import logging
 import re
+import functools
 import subprocess
+import threading
 from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
-from .narration_config import REFERENCE_AUDIO_DIR
+from .narration_config import REFERENCE_AUDIO_DIR, MAX_REFERENCE_AUDIO_BYTES
 from .narration_language import is_text_english
 
 logger = logging.getLogger(__name__)
 
-_FFMPEG_PATH_CACHE = None
-
 
 def _find_bundled_ffmpeg():
     """
@@ -39,16 +39,13 @@ def _find_bundled_ffmpeg():
     return None
 
 
+@functools.lru_cache(maxsize=1)
 def get_ffmpeg_path():
     """
     Resolve the ffmpeg executable, preferring the binary bundled in node_modules so narration
     works on a clean PC with no system ffmpeg. Falls back to the system PATH and common install
     locations, then bare 'ffmpeg' (PATH) as a last resort. Result is cached.
     """
-    global _FFMPEG_PATH_CACHE
-    if _FFMPEG_PATH_CACHE:
-        return _FFMPEG_PATH_CACHE
-
     import shutil
     import platform
 
@@ -70,12 +67,83 @@ def get_ffmpeg_path():
         resolved = next((p for p in common_paths if os.path.exists(p)), None)
 
     # Last resort: rely on PATH at call time
-    _FFMPEG_PATH_CACHE = resolved or 'ffmpeg'
-    return _FFMPEG_PATH_CACHE
+    return resolved or 'ffmpeg'
 
 # Create blueprint for audio processing routes
 audio_bp = Blueprint('narration_audio', __name__)
 
+# Largest request body accepted by the reference routes: base64 of the largest allowed clip,
+# plus room for the JSON/multipart framing and reference text
+_MAX_BASE64_AUDIO_CHARS = MAX_REFERENCE_AUDIO_BYTES * 4 // 3 + 4
+_MAX_REFERENCE_REQUEST_BYTES = _MAX_BASE64_AUDIO_CHARS + 1024 * 1024
+
+@audio_bp.before_request
+def reject_oversized_reference():
+    """Refuse oversized uploads before Flask buffers and parses the body"""
+    if request.content_length is not None and request.content_length > _MAX_REFERENCE_REQUEST_BYTES:
+        logger.warning(f"Rejected {request.path} request with {request.content_length} byte body")
+        return jsonify({'error': 'Request body too large'}), 413
+
+# ffmpeg has no resident/server mode that could be fed jobs, so a pool of warm processes isn't
+# possible. Instead every ffmpeg run goes through run_ffmpeg, which caps how many run at once
+# so a burst of uploads queues briefly rather than oversubscribing the CPU.
+_FFMPEG_SLOTS = threading.BoundedSemaphore(os.cpu_count() or 1)
+
+# Prepended to every ffmpeg command: never read the terminal (a known hang with subprocess),
+# only log errors, and decode single-threaded. The jobs are short, so concurrent requests get
+# better aggregate throughput from one thread each than from N threads fighting for cores.
+_FFMPEG_COMMON_ARGS = ['-nostdin', '-hide_banner', '-loglevel', 'error', '-threads', '1']
+
+def run_ffmpeg(args, **kwargs):
+    """Run ffmpeg with the given arguments (excluding the executable) via subprocess.run."""
+    with _FFMPEG_SLOTS:
+        return subprocess.run([get_ffmpeg_path(), *_FFMPEG_COMMON_ARGS, *args], **kwargs)
+
+def _needs_seekable_input(head):
+    """
+    True if head (the first bytes of an upload) starts an MP4-family container (mp4, m4a,
+    mov, 3gp). These begin with an 'ftyp' box -- a 4-byte size, then the box type -- and may
+    keep their index at the end, so ffmpeg can't demux them from a non-seekable pipe.
+    Sniffed rather than taken from the extension: the recorder names every upload .wav.
+    """
+    return head[4:8] == b'ftyp'
+
+# Flags for writing decoded audio with a raw descriptor. O_CLOEXEC keeps the fd from leaking
+# into the ffmpeg child; O_BINARY only exists (and matters) on Windows.
+_WRITE_FLAGS = (os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+                | getattr(os, 'O_CLOEXEC', 0) | getattr(os, 'O_BINARY', 0))
+
+def write_audio_bytes(filepath, audio_bytes):
+    """
+    Write a bytes payload to disk in one go via a raw file descriptor, skipping the
+    BufferedWriter layer that open() adds. os.write may short-write, so loop until done.
+    """
+    write_audio_chunks(filepath, (audio_bytes,))
+
+def write_audio_chunks(filepath, chunks):
+    """Write an iterable of byte chunks to filepath through a single raw file descriptor."""
+    fd = os.open(filepath, _WRITE_FLAGS, 0o644)
+    try:
+        for chunk in chunks:
+            view = memoryview(chunk)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+    finally:
+        os.close(fd)
+
+# Base64 characters decoded per slice; a multiple of 4 so every slice decodes on its own
+_B64_CHUNK_CHARS = 256 * 1024
+
+def iter_base64_chunks(audio_data_base64):
+    """
+    Decode a base64 string slice by slice, so the full decoded payload never has to sit in
+    memory next to the (already large) request string. The C decoder validates as it goes,
+    raising binascii.Error on malformed input.
+    """
+    for offset in range(0, len(audio_data_base64), _B64_CHUNK_CHARS):
+        yield base64.b64decode(audio_data_base64[offset:offset + _B64_CHUNK_CHARS], validate=True)
+
 def add_silence_to_audio(input_path, output_path):
     """
     Add 1 second of silence to the end of an audio file using ffmpeg
@@ -94,16 +162,16 @@ def add_silence_to_audio(input_path, output_path):
         # ffmpeg command to add 1 second of silence at the end
         # -f lavfi -t 1 -i anullsrc=channel_layout=stereo:sample_rate=44100 creates 1s of silence
         # [0:a][1:a]concat=n=2:v=0:a=1 concatenates the original audio with the silence
-        ffmpeg_cmd = [
-            get_ffmpeg_path(),
+        ffmpeg_args = [
             '-i', input_path,
             '-f', 'lavfi', '-t', '1', '-i', 'anullsrc=channel_layout=stereo:sample_rate=44100',
             '-filter_complex', '[0:a][1:a]concat=n=2:v=0:a=1',
+            '-threads', '1',  # Single-threaded filtering/encoding as well
             '-y',  # Overwrite output file if it exists
             output_path
         ]
 
-        result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, timeout=30)
+        result = run_ffmpeg(ffmpeg_args, capture_output=True, text=True, timeout=30)
 
         if result.returncode == 0:
             logger.info(f"Successfully added silence to audio: {output_path}")
@@ -120,74 +188,157 @@ def add_silence_to_audio(input_path, output_path):
         logger.error(f"FFmpeg error: {str(e)}")
         return False
 
-@audio_bp.route('/process-base64-reference', methods=['POST'])
-def process_base64_audio_reference():
-    """Process base64 encoded audio data as reference"""
-    try:
-        # Use force=True cautiously, but good for flexibility if client Content-Type is wrong
-        data = request.get_json(force=True, silent=True)
-
-        if not data:
-            # Try getting raw data if JSON parsing failed but content looks like JSON
-            raw_data = request.get_data(as_text=True)
-            logger.warning(f"Request content-type was {request.content_type}, but failed to parse as JSON. Raw data starts with: {raw_data[:100]}...")
-            return jsonify({'error': 'Invalid JSON data received'}), 400
-
-        # Log keys safely
+def add_silence_to_audio_stream(chunks, output_path):
+    """
+    Same as add_silence_to_audio, but streams the source audio to ffmpeg over stdin so the
+    handlers don't have to write a temporary input file first. ffmpeg still writes
+    output_path itself, which keeps the WAV header sizes correct (a piped WAV has none).
 
+    Args:
+        chunks (iterable of bytes): Encoded source audio
+        output_path (str): Path to save the processed audio file
 
-        audio_data_base64 = data.get('audio_data') if isinstance(data, dict) else None
-        reference_text = data.get('reference_text', '') if isinstance(data, dict) else ''
+    Returns:
+        bool: True if successful, False otherwise
 
+    Raises:
+        binascii.Error: If chunks is decoding base64 and hits invalid data
+    """
+    try:
+        logger.info(f"Adding 1s silence to piped audio -> {output_path}")
 
+        ffmpeg_cmd = [
+            get_ffmpeg_path(), *_FFMPEG_COMMON_ARGS,
+            '-i', 'pipe:0',
+            '-f', 'lavfi', '-t', '1', '-i', 'anullsrc=channel_layout=stereo:sample_rate=44100',
+            '-filter_complex', '[0:a][1:a]concat=n=2:v=0:a=1',
+            '-threads', '1',  # Single-threaded filtering/encoding as well
+            '-y',  # Overwrite output file if it exists
+            output_path
+        ]
 
-        if not audio_data_base64 or not isinstance(audio_data_base64, str):
-            logger.error("No 'audio_data' string found in request JSON.")
-            return jsonify({'error': 'Missing or invalid audio_data (must be a base64 string)'}), 400
+        with _FFMPEG_SLOTS:
+            proc = subprocess.Popen(ffmpeg_cmd, stdin=subprocess.PIPE,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            # Drain stderr concurrently so a chatty ffmpeg can't block while we feed stdin
+            stderr_output = []
+            stderr_reader = threading.Thread(target=lambda: stderr_output.append(proc.stderr.read()),
+                                             daemon=True)
+            stderr_reader.start()
+            try:
+                try:
+                    for chunk in chunks:
+                        proc.stdin.write(chunk)
+                except BrokenPipeError:
+                    pass  # ffmpeg exited early; its return code reports why
+                finally:
+                    try:
+                        proc.stdin.close()
+                    except BrokenPipeError:
+                        pass
+                returncode = proc.wait(timeout=30)
+            except BaseException:
+                proc.kill()
+                proc.wait()
+                raise
+            stderr_reader.join()
+
+        if returncode == 0:
+            logger.info(f"Successfully added silence to audio: {output_path}")
+            return True
+        else:
+            logger.error(f"FFmpeg failed with code {returncode}")
+            logger.error(f"FFmpeg stderr: {b''.join(stderr_output).decode('utf-8', errors='replace')}")
+            return False
 
-        # Basic base64 format check (padding and characters)
-        if not re.match(r'^[A-Za-z0-9+/]*={0,2}$', audio_data_base64.strip()):
-             logger.error("Audio data does not appear to be valid base64.")
-             sample = audio_data_base64[:100] + ('...' if len(audio_data_base64) > 100 else '')
-             logger.error(f"Invalid base64 sample: {sample}")
-             return jsonify({'error': 'Invalid base64 format in audio_data'}), 400
+    except subprocess.TimeoutExpired:
+        logger.error("FFmpeg timeout expired")
+        return False
+    except base64.binascii.Error:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    except Exception as e:
+        logger.error(f"FFmpeg error: {str(e)}")
+        return False
 
-        # Generate a unique filename
-        unique_id = str(uuid.uuid4())
+def _save_padded(make_chunks, filepath):
+    """
+    Write the audio produced by make_chunks() to filepath with 1 second of trailing silence
+    for F5-TTS compatibility, falling back to the unpadded audio if ffmpeg fails.
+    """
+    if add_silence_to_audio_stream(make_chunks(), filepath):
+        return
+    logger.warning("FFmpeg preprocessing failed, falling back to original audio")
+    try:
+        write_audio_chunks(filepath, make_chunks())
+    except BaseException:
+        # Don't leave a 0-byte or truncated clip behind (e.g. base64 that fails mid-way)
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        raise
+
+def save_padded_audio(audio_bytes, filepath):
+    """Save raw audio bytes to filepath with trailing silence (see _save_padded)."""
+    _save_padded(lambda: (audio_bytes,), filepath)
+
+def save_padded_base64(audio_data_base64, filepath):
+    """Decode base64 audio in slices straight into ffmpeg and save it with trailing silence."""
+    _save_padded(lambda: iter_base64_chunks(audio_data_base64), filepath)
+
+def _classify_language(text):
+    """Return (is_english, language label) for a reference text, running detection once"""
+    if not text:
+        return True, "Unknown"
+    # Single characters say nothing about the language; longer texts are judged on their
+    # first 256 characters, which bounds both the detector and its cache key
+    is_english = True if len(text) < 2 else is_text_english(text[:256])
+    return is_english, "English" if is_english else "Non-English"
+
+def _persist_reference(audio_source, prefix, reference_text, ext='.wav'):
+    """
+    Save a reference clip under a unique name with 1 second of trailing silence (for F5-TTS
+    compatibility) and build the JSON payload the reference routes return.
 
-        # Create temporary filename for initial save
-        temp_filename = f"temp_recorded_b64_{unique_id}.wav"
-        temp_filepath = os.path.join(REFERENCE_AUDIO_DIR, temp_filename)
+    Args:
+        audio_source: Base64 string, raw bytes, or a Werkzeug FileStorage
+        prefix (str): Filename prefix, e.g. 'recorded_b64'
+        reference_text (str): Text spoken in the clip (transcription is handled by the frontend)
+        ext (str): Extension of the saved file
 
-        # Final filename for processed audio
-        filename = f"recorded_b64_{unique_id}.wav"
-        filepath = os.path.join(REFERENCE_AUDIO_DIR, filename)
+    Returns:
+        dict: Response data for jsonify
 
-        # Decode and save the audio data to temporary location
+    Raises:
+        binascii.Error: If audio_source is a string that is not valid base64
+    """
+    unique_id = secrets.token_hex(8)
+    filename = f"{prefix}_{unique_id}{ext}"
+    filepath = os.path.join(REFERENCE_AUDIO_DIR, filename)
+
+    if isinstance(audio_source, str):
+        # 12 base64 characters decode to the first 9 bytes; invalid data is reported by the
+        # full decode below
+        head = base64.b64decode(audio_source[:12], validate=False)
+        make_chunks = lambda: iter_base64_chunks(audio_source)
+    elif isinstance(audio_source, bytes):
+        head = audio_source[:8]
+        make_chunks = lambda: (audio_source,)
+    else:
+        # A FileStorage: read it whole (uploads are capped at MAX_REFERENCE_AUDIO_BYTES)
+        audio_source = audio_source.read()
+        head = audio_source[:8]
+        make_chunks = lambda: (audio_source,)
+
+    if _needs_seekable_input(head):
+        # Go through a temporary file so ffmpeg can seek to the container index
+        temp_filepath = os.path.join(REFERENCE_AUDIO_DIR, f"temp_{filename}")
         try:
-            audio_bytes = base64.b64decode(audio_data_base64)
-
-            with open(temp_filepath, 'wb') as f:
-                f.write(audio_bytes)
-
-        except base64.binascii.Error as decode_error:
-            logger.error(f"Error decoding base64 data: {decode_error}")
-            sample = audio_data_base64[:100] + '...' if len(audio_data_base64) > 100 else audio_data_base64
-            logger.error(f"Base64 data sample: {sample}")
-            return jsonify({'error': f'Invalid base64 data: {str(decode_error)}'}), 400
-        except IOError as e:
-             logger.error(f"Error saving decoded audio to file {temp_filepath}: {e}", exc_info=True)
-             return jsonify({'error': f'Error saving audio file: {str(e)}'}), 500
-        except Exception as e:
-            logger.exception(f"Unexpected error saving base64 audio: {e}")
-            return jsonify({'error': f'Internal server error saving audio: {str(e)}'}), 500
-
-        # Verify temporary file was saved
-        if not os.path.exists(temp_filepath):
-            logger.error(f"File saving failed unexpectedly for {temp_filepath}")
-            return jsonify({'error': 'Failed to save audio file after decoding'}), 500
-
-        # Add 1 second of silence to the end of the audio for F5-TTS compatibility
+            write_audio_chunks(temp_filepath, make_chunks())
+        except BaseException:
+            if os.path.exists(temp_filepath):
+                os.unlink(temp_filepath)
+            raise
         try:
             if add_silence_to_audio(temp_filepath, filepath):
                 # Remove the temporary file after successful processing
@@ -196,412 +347,237 @@ def process_base64_audio_reference():
             else:
                 # Fallback: use the original file without preprocessing
                 logger.warning("FFmpeg preprocessing failed, falling back to original audio")
-                os.rename(temp_filepath, filepath)
+                os.replace(temp_filepath, filepath)
         except Exception as e:
             logger.error(f"Error during audio preprocessing: {str(e)}")
             # Fallback: use the original file without preprocessing
             logger.warning("Falling back to original audio without silence padding")
-            os.rename(temp_filepath, filepath)
+            os.replace(temp_filepath, filepath)
+    else:
+        _save_padded(make_chunks, filepath)
+
+    # Skip transcription - handled by frontend
+    is_english, language = _classify_language(reference_text)
+
+    return {
+        'success': True,
+        'filepath': filepath,
+        'filename': filename,
+        'reference_text': reference_text,
+        'is_english': is_english,
+        'language': language
+    }
+
+def _strip_base64_audio(audio_data_base64):
+    """
+    Slices are decoded independently and strictly (validate=True rejects any character
+    outside the base64 alphabet), so drop surrounding whitespace and any data-URL header
+    (data:audio/wav;base64,) up front.
+    """
+    audio_data_base64 = audio_data_base64.strip()
+    if audio_data_base64.startswith('data:'):
+        audio_data_base64 = audio_data_base64.partition(',')[2]
+    return audio_data_base64
 
-        # --- Transcription Logic ---
-        final_reference_text = reference_text
-        is_english = True # Default assumption
-        language = "Unknown" # Default
+@audio_bp.route('/process-base64-reference', methods=['POST'])
+def process_base64_audio_reference():
+    """Process base64 encoded audio data as reference"""
+    # Use force=True cautiously, but good for flexibility if client Content-Type is wrong
+    data = request.get_json(force=True, silent=True)
 
-        # Skip transcription - handled by frontend
-        is_english = is_text_english(final_reference_text) if final_reference_text else True
-        language = "English" if is_english else "Non-English" if final_reference_text else "Unknown"
+    if not data:
+        # Log the start of the raw body. get_json already cached it as bytes (so the stream is
+        # spent); slice before decoding rather than decoding a multi-MB body to text
+        raw_preview = request.get_data()[:100].decode('utf-8', errors='replace')
+        logger.warning(f"Request content-type was {request.content_type}, but failed to parse as JSON. Raw data starts with: {raw_preview}...")
+        return jsonify({'error': 'Invalid JSON data received'}), 400
 
+    audio_data_base64 = data.get('audio_data') if isinstance(data, dict) else None
+    reference_text = data.get('reference_text', '') if isinstance(data, dict) else ''
 
+    if not audio_data_base64 or not isinstance(audio_data_base64, str):
+        logger.error("No 'audio_data' string found in request JSON.")
+        return jsonify({'error': 'Missing or invalid audio_data (must be a base64 string)'}), 400
 
-        response_data = {
-            'success': True,
-            'filepath': filepath,
-            'filename': filename,
-            'reference_text': final_reference_text,
-            'is_english': is_english,
-            'language': language
-        }
+    # Chunked requests carry no Content-Length, so check the payload itself too
+    if len(audio_data_base64) > _MAX_BASE64_AUDIO_CHARS:
+        return jsonify({'error': 'audio_data exceeds the maximum reference audio size'}), 413
 
-        return jsonify(response_data)
+    audio_data_base64 = _strip_base64_audio(audio_data_base64)
 
-    except Exception as e:
-        logger.exception(f"Error in process_base64_audio_reference: {e}")
-        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+    # Decode and save the audio data
+    try:
+        response_data = _persist_reference(audio_data_base64, 'recorded_b64', reference_text)
+    except base64.binascii.Error as decode_error:
+        logger.error(f"Error decoding base64 data: {decode_error}")
+        sample = audio_data_base64[:100] + '...' if len(audio_data_base64) > 100 else audio_data_base64
+        logger.error(f"Base64 data sample: {sample}")
+        return jsonify({'error': f'Invalid base64 data: {str(decode_error)}'}), 400
+    except IOError as e:
+        logger.error(f"Error saving decoded audio file: {e}", exc_info=True)
+        return jsonify({'error': f'Error saving audio file: {str(e)}'}), 500
+
+    return jsonify(response_data)
 
 @audio_bp.route('/upload-reference', methods=['POST'])
 def upload_reference_audio():
     """Upload reference audio file and optionally transcribe"""
-    try:
-        if 'file' not in request.files:
-            logger.error("Upload request missing 'file' part.")
-            return jsonify({'error': 'No file part in the request'}), 400
-
-        file = request.files['file']
-        if not file or file.filename == '':
-            logger.error("Upload request received with no selected file.")
-            return jsonify({'error': 'No selected file'}), 400
-
-        # Sanitize filename and make unique
-        original_filename = secure_filename(file.filename)
-        unique_id = str(uuid.uuid4())
-        base, ext = os.path.splitext(original_filename)
-        # Ensure extension is reasonable, default to .wav if missing/odd
-        ext = ext if ext else '.wav'
-
-        # Create temporary filename for initial save
-        temp_filename = f"temp_{base}_{unique_id}{ext}"
-        temp_filepath = os.path.join(REFERENCE_AUDIO_DIR, temp_filename)
-
-        # Final filename for processed audio
-        unique_filename = f"{base}_{unique_id}{ext}"
-        filepath = os.path.join(REFERENCE_AUDIO_DIR, unique_filename)
-
-        # Save the uploaded file to temporary location
-        file.save(temp_filepath)
-
-        # Add 1 second of silence to the end of the audio for F5-TTS compatibility
-        try:
-            if add_silence_to_audio(temp_filepath, filepath):
-                # Remove the temporary file after successful processing
-                os.unlink(temp_filepath)
-                logger.info(f"Removed temporary file: {temp_filepath}")
-            else:
-                # Fallback: use the original file without preprocessing
-                logger.warning("FFmpeg preprocessing failed, falling back to original audio")
-                os.rename(temp_filepath, filepath)
-        except Exception as e:
-            logger.error(f"Error during audio preprocessing: {str(e)}")
-            # Fallback: use the original file without preprocessing
-            logger.warning("Falling back to original audio without silence padding")
-            os.rename(temp_filepath, filepath)
-
-        # Get reference text from form data
-        reference_text = request.form.get('reference_text', '')
-
-
-        # --- Transcription Logic ---
-        final_reference_text = reference_text
-        is_english = True
-        language = "Unknown"
-
-        # Skip transcription - handled by frontend
-        is_english = is_text_english(final_reference_text) if final_reference_text else True
-        language = "English" if is_english else "Non-English" if final_reference_text else "Unknown"
+    if 'file' not in request.files:
+        logger.error("Upload request missing 'file' part.")
+        return jsonify({'error': 'No file part in the request'}), 400
 
+    file = request.files['file']
+    if not file or file.filename == '':
+        logger.error("Upload request received with no selected file.")
+        return jsonify({'error': 'No selected file'}), 400
 
-        return jsonify({
-            'success': True,
-            'filepath': filepath,
-            'filename': unique_filename,
-            'reference_text': final_reference_text,
-            'is_english': is_english,
-            'language': language
-        })
+    # Sanitize filename; _persist_reference makes it unique
+    base, ext = os.path.splitext(secure_filename(file.filename))
+    # Ensure extension is reasonable, default to .wav if missing/odd
+    ext = ext if ext else '.wav'
 
-    except Exception as e:
-        logger.exception(f"Error handling uploaded reference file: {e}")
-        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+    reference_text = request.form.get('reference_text', '')
+    return jsonify(_persist_reference(file, base, reference_text, ext))
 
 # This route seems redundant if /process-base64-reference handles JSON correctly.
 # Kept for backward compatibility or specific form-data scenarios.
 @audio_bp.route('/record-reference', methods=['POST'])
 def record_reference_audio():
     """Handle reference audio potentially sent as form data (e.g., from recorder.js)"""
-
-
     # Check if content type suggests base64 JSON first
     content_type = request.headers.get('Content-Type', '').lower()
     if 'application/json' in content_type:
-
         # Use the dedicated base64 handler
         return process_base64_audio_reference()
 
     # Fallback: Handle as form data file upload ('audio_data' field expected)
-
-    try:
-        if 'audio_data' not in request.files:
-            # Check form fields as fallback if file isn't present
-            if 'audio_data' in request.form:
-                logger.warning("/record-reference: 'audio_data' found in form fields, not files. Might be base64 string?")
-                # Attempt to handle as if it were base64 JSON payload
-                try:
-                    mock_json_payload = {
-                        'audio_data': request.form['audio_data'],
-                        'reference_text': request.form.get('reference_text', ''),
-                        'transcribe': request.form.get('transcribe', 'false')
-                    }
-                    # Temporarily replace request data for the handler function
-                    # This is a bit hacky; ideally client sends consistent format.
-                    original_json = request.json
-                    request.json_data_override = mock_json_payload # Custom attribute to pass data
-                    response = process_base64_audio_reference_from_override()
-                    request.json_data_override = None # Clean up
-                    return response
-                except Exception as form_b64_err:
-                    logger.error(f"Failed to process 'audio_data' from form field as base64: {form_b64_err}")
-                    return jsonify({'error': 'Received audio_data in form, but failed to process as base64'}), 400
-
-            logger.error("/record-reference: No 'audio_data' found in request files.")
-            return jsonify({'error': 'Missing audio_data file part'}), 400
-
-        audio_file = request.files['audio_data']
-
-
-        # Generate unique filename, save, and transcribe (similar to /upload-reference)
-        unique_id = str(uuid.uuid4())
-
-        # Create temporary filename for initial save
-        temp_filename = f"temp_recorded_form_{unique_id}.wav"
-        temp_filepath = os.path.join(REFERENCE_AUDIO_DIR, temp_filename)
-
-        # Final filename for processed audio
-        filename = f"recorded_form_{unique_id}.wav"
-        filepath = os.path.join(REFERENCE_AUDIO_DIR, filename)
-
-        # Save the recorded file to temporary location
-        audio_file.save(temp_filepath)
-
-        # Add 1 second of silence to the end of the audio for F5-TTS compatibility
-        try:
-            if add_silence_to_audio(temp_filepath, filepath):
-                # Remove the temporary file after successful processing
-                os.unlink(temp_filepath)
-                logger.info(f"Removed temporary file: {temp_filepath}")
-            else:
-                # Fallback: use the original file without preprocessing
-                logger.warning("FFmpeg preprocessing failed, falling back to original audio")
-                os.rename(temp_filepath, filepath)
-        except Exception as e:
-            logger.error(f"Error during audio preprocessing: {str(e)}")
-            # Fallback: use the original file without preprocessing
-            logger.warning("Falling back to original audio without silence padding")
-            os.rename(temp_filepath, filepath)
-
-        reference_text = request.form.get('reference_text', '')
-
-
-        # --- Transcription Logic ---
-        final_reference_text = reference_text
-        is_english = True
-        language = "Unknown"
-
-        # Skip transcription - handled by frontend
-        is_english = is_text_english(final_reference_text) if final_reference_text else True
-        language = "English" if is_english else "Non-English" if final_reference_text else "Unknown"
-
-
-        return jsonify({
-            'success': True,
-            'filepath': filepath,
-            'filename': filename,
-            'reference_text': final_reference_text,
-            'is_english': is_english,
-            'language': language
-        })
-
-    except Exception as e:
-        logger.exception(f"Error in /record-reference (form data handling): {e}")
-        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
-
-# Helper to allow record_reference to call the base64 logic with mocked data
-def process_base64_audio_reference_from_override():
-     # This function assumes request.json_data_override is set
-     if not hasattr(request, 'json_data_override') or not request.json_data_override:
-         logger.error("process_base64_audio_reference_from_override called without override data")
-         return jsonify({'error': 'Internal server error: missing override data'}), 500
-     data = request.json_data_override
-     # Now reuse the logic, but source data from the override dict
-     # This duplicates the core logic of process_base64_audio_reference.
-     # Consider refactoring process_base64_audio_reference to accept a dict?
-     # For now, keep it simple:
-     audio_data_base64 = data.get('audio_data')
-     reference_text = data.get('reference_text', '')
-
-     # (Paste the core decoding, saving, and transcription logic from process_base64_audio_reference here)
-     # ... [omitted for brevity - this needs careful copy/paste or refactoring] ...
-     # This approach is fragile. Better to refactor the core logic into a helper function.
-
-     # --- Simplified Placeholder - Requires full logic implementation ---
-     logger.warning("Executing simplified logic in process_base64_audio_reference_from_override. Needs full implementation.")
-     if not audio_data_base64: return jsonify({'error': 'Missing audio_data in override'}), 400
-     try:
-        # (Placeholder for Decode, Save, Transcribe logic)
-        unique_id = str(uuid.uuid4())
-
-        # Create temporary filename for initial save
-        temp_filename = f"temp_recorded_override_{unique_id}.wav"
-        temp_filepath = os.path.join(REFERENCE_AUDIO_DIR, temp_filename)
-
-        # Final filename for processed audio
-        filename = f"recorded_override_{unique_id}.wav"
-        filepath = os.path.join(REFERENCE_AUDIO_DIR, filename)
-
-        audio_bytes = base64.b64decode(audio_data_base64)
-        with open(temp_filepath, 'wb') as f: f.write(audio_bytes)
-
-        # Add 1 second of silence to the end of the audio for F5-TTS compatibility
+    reference_text = request.form.get('reference_text', '')
+
+    if 'audio_data' not in request.files:
+        # Check form fields as fallback if file isn't present
+        if 'audio_data' in request.form:
+            logger.warning("/record-reference: 'audio_data' found in form fields, not files. Might be base64 string?")
+            try:
+                audio_data_base64 = _strip_base64_audio(request.form['audio_data'])
+                return jsonify(_persist_reference(audio_data_base64, 'recorded_override', reference_text))
+            except base64.binascii.Error as form_b64_err:
+                logger.error(f"Failed to process 'audio_data' from form field as base64: {form_b64_err}")
+                return jsonify({'error': 'Received audio_data in form, but failed to process as base64'}), 400
+
+        logger.error("/record-reference: No 'audio_data' found in request files.")
+        return jsonify({'error': 'Missing audio_data file part'}), 400
+
+    return jsonify(_persist_reference(request.files['audio_data'], 'recorded_form', reference_text))
+
+
+# [[HH:]MM:]SS[.ms] - seconds may carry a fraction, hours and minutes are whole numbers
+_TIME_RE = re.compile(r'(?:(?:(\d+):)?(\d+):)?(\d+(?:\.\d*)?)')
+
+def _parse_time(time_raw):
+    """Convert seconds or an HH:MM:SS.ms / MM:SS.ms string to seconds"""
+    if isinstance(time_raw, (int, float)):
+        return float(time_raw)
+    if isinstance(time_raw, str):
+        match = _TIME_RE.fullmatch(time_raw.strip())
+        if match:
+            h, m, s = match.groups()
+            return int(h or 0) * 3600 + int(m or 0) * 60 + float(s)
         try:
-            if add_silence_to_audio(temp_filepath, filepath):
-                # Remove the temporary file after successful processing
-                os.unlink(temp_filepath)
-                logger.info(f"Removed temporary file: {temp_filepath}")
-            else:
-                # Fallback: use the original file without preprocessing
-                logger.warning("FFmpeg preprocessing failed, falling back to original audio")
-                os.rename(temp_filepath, filepath)
-        except Exception as e:
-            logger.error(f"Error during audio preprocessing: {str(e)}")
-            # Fallback: use the original file without preprocessing
-            logger.warning("Falling back to original audio without silence padding")
-            os.rename(temp_filepath, filepath)
-
-        # (Placeholder for Transcription logic)
-        final_reference_text = reference_text or "Transcription Placeholder"
-        is_english = True
-        language = "Unknown (Placeholder)"
-
-        response_data = {
-            'success': True, 'filepath': filepath, 'filename': filename,
-            'reference_text': final_reference_text, 'is_english': is_english, 'language': language
-        }
-        return jsonify(response_data)
-     except Exception as e:
-         logger.error(f"Error processing override data: {e}")
-         return jsonify({'error': f'Error processing override data: {str(e)}'}), 500
-     # --- End Placeholder ---
-
+            return float(time_raw) # e.g. negative or exponent notation
+        except ValueError:
+            raise ValueError(f"Invalid time format: {time_raw}")
+    raise ValueError(f"Unsupported time type: {type(time_raw)}")
 
 @audio_bp.route('/extract-segment', methods=['POST'])
 def extract_audio_segment():
     """Extract audio segment from video using ffmpeg"""
-    try:
-        data = request.json
-        video_path = data.get('video_path')
-        start_time_raw = data.get('start_time') # Can be seconds or HH:MM:SS.ms
-        end_time_raw = data.get('end_time')     # Can be seconds or HH:MM:SS.ms
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    video_path = data.get('video_path')
+    start_time_raw = data.get('start_time') # Can be seconds or HH:MM:SS.ms
+    end_time_raw = data.get('end_time')     # Can be seconds or HH:MM:SS.ms
 
 
 
-        if not video_path or start_time_raw is None or end_time_raw is None:
-            return jsonify({'error': 'Missing required parameters (video_path, start_time, end_time)'}), 400
+    if not video_path or start_time_raw is None or end_time_raw is None:
+        return jsonify({'error': 'Missing required parameters (video_path, start_time, end_time)'}), 400
 
-        # Ensure video path exists
-        if not os.path.exists(video_path):
-            logger.error(f"Video file not found for extraction: {video_path}")
-            return jsonify({'error': f'Video file not found: {video_path}'}), 404
-
-        # Convert times to seconds if needed (handle HH:MM:SS.ms format)
-        def parse_time(time_raw):
-            if isinstance(time_raw, (int, float)):
-                return float(time_raw)
-            if isinstance(time_raw, str):
-                try:
-                    parts = time_raw.split(':')
-                    if len(parts) == 3:
-                        h, m, s_ms = parts
-                        s = float(s_ms) # Handles seconds with milliseconds
-                        return int(h) * 3600 + int(m) * 60 + s
-                    elif len(parts) == 2: # MM:SS.ms
-                        m, s_ms = parts
-                        s = float(s_ms)
-                        return int(m) * 60 + s
-                    else: # Assume seconds
-                        return float(time_raw)
-                except ValueError:
-                     raise ValueError(f"Invalid time format: {time_raw}")
-            raise ValueError(f"Unsupported time type: {type(time_raw)}")
+    # Ensure video path exists
+    if not os.path.exists(video_path):
+        logger.error(f"Video file not found for extraction: {video_path}")
+        return jsonify({'error': f'Video file not found: {video_path}'}), 404
 
-        try:
-            start_time = parse_time(start_time_raw)
-            end_time = parse_time(end_time_raw)
-        except ValueError as e:
-            logger.error(f"Error parsing time values: {e}")
-            return jsonify({'error': str(e)}), 400
-
-        if start_time < 0 or end_time <= start_time:
-            return jsonify({'error': 'Invalid time range (start must be non-negative, end must be after start)'}), 400
-
-        duration = end_time - start_time
-
-        # Generate unique output path
-        unique_id = str(uuid.uuid4())
-
-        # Create temporary filename for initial extraction
-        temp_output_filename = f"temp_segment_{unique_id}.wav"
-        temp_output_path = os.path.join(REFERENCE_AUDIO_DIR, temp_output_filename)
-
-        # Final filename for processed audio
-        output_filename = f"segment_{unique_id}.wav"
-        output_path = os.path.join(REFERENCE_AUDIO_DIR, output_filename)
-
-        # Construct ffmpeg command for extraction
-        # -vn: no video
-        # -acodec pcm_s16le: Standard WAV format
-        # -ar 44100: Sample rate (adjust if F5TTS prefers different)
-        # -ac 1: Mono channel (adjust if needed)
-        # -ss before -i for faster seeking on keyframes (usually good)
-        # -t for duration
-        cmd = [
-            get_ffmpeg_path(), '-y', # Overwrite output without asking
-            '-ss', str(start_time), # Seek to start time
-            '-i', video_path,
-            '-t', str(duration), # Specify duration
-            '-vn',
-            '-acodec', 'pcm_s16le',
-            '-ar', '44100', # Consider making this configurable or detecting source rate
-            '-ac', '1',
-            temp_output_path  # Extract to temporary file first
-        ]
+    try:
+        start_time = _parse_time(start_time_raw)
+        end_time = _parse_time(end_time_raw)
+    except ValueError as e:
+        logger.error(f"Error parsing time values: {e}")
+        return jsonify({'error': str(e)}), 400
+
+    if start_time < 0 or end_time <= start_time:
+        return jsonify({'error': 'Invalid time range (start must be non-negative, end must be after start)'}), 400
+
+    duration = end_time - start_time
+
+    # Generate unique output path
+    unique_id = secrets.token_hex(8)
+
+    # Final filename for processed audio
+    output_filename = f"segment_{unique_id}.wav"
+    output_path = os.path.join(REFERENCE_AUDIO_DIR, output_filename)
+
+    # Construct a single ffmpeg command that extracts the segment and appends 1 second of
+    # silence for F5-TTS compatibility, so there is no intermediate WAV to write and re-read
+    # -ss/-t before -i: seek and limit reading on the input (usually fast on keyframes)
+    # anullsrc: 1s of mono silence at the output rate, concatenated after the segment
+    # -acodec pcm_s16le: Standard WAV format
+    # -ar 44100: Sample rate (adjust if F5TTS prefers different)
+    # -ac 1: Mono channel (adjust if needed)
+    ffmpeg_args = [
+        '-y', # Overwrite output without asking
+        '-ss', str(start_time), # Seek to start time
+        '-t', str(duration), # Specify duration
+        '-i', video_path,
+        '-f', 'lavfi', '-t', '1', '-i', 'anullsrc=channel_layout=mono:sample_rate=44100',
+        '-filter_complex',
+        '[0:a]aresample=44100,aformat=channel_layouts=mono[a0];[a0][1:a]concat=n=2:v=0:a=1',
+        '-vn',
+        '-acodec', 'pcm_s16le',
+        '-ar', '44100', # Consider making this configurable or detecting source rate
+        '-ac', '1',
+        '-threads', '1',
+        output_path
+    ]
 
 
-        # Execute ffmpeg
-        try:
-            # Use capture_output=True to get stderr for debugging if needed
-            result = subprocess.run(cmd, check=True, capture_output=True, text=True, encoding='utf-8')
-
-            logger.debug(f"ffmpeg stdout:\n{result.stdout}")
-            logger.debug(f"ffmpeg stderr:\n{result.stderr}")
-        except FileNotFoundError:
-            logger.error("ffmpeg command not found. Ensure ffmpeg is installed and in the system PATH.")
-            return jsonify({'error': 'ffmpeg not found. Please install ffmpeg.'}), 500
-        except subprocess.CalledProcessError as e:
-            logger.error(f"ffmpeg command failed with exit code {e.returncode}")
-            logger.error(f"ffmpeg stderr:\n{e.stderr}")
-            # Try to delete potentially incomplete output file
-            if os.path.exists(temp_output_path): os.remove(temp_output_path)
-            return jsonify({'error': f'ffmpeg failed: {e.stderr[:200]}...'}), 500
-
-        # Add 1 second of silence to the end of the extracted audio for F5-TTS compatibility
-        try:
-            if add_silence_to_audio(temp_output_path, output_path):
-                # Remove the temporary file after successful processing
-                os.unlink(temp_output_path)
-                logger.info(f"Removed temporary file: {temp_output_path}")
-            else:
-                # Fallback: use the original file without preprocessing
-                logger.warning("FFmpeg preprocessing failed, falling back to original audio")
-                os.rename(temp_output_path, output_path)
-        except Exception as e:
-            logger.error(f"Error during audio preprocessing: {str(e)}")
-            # Fallback: use the original file without preprocessing
-            logger.warning("Falling back to original audio without silence padding")
-            os.rename(temp_output_path, output_path)
-
-        # --- Skip transcription - handled by frontend ---
-        reference_text = ""
-        is_english = True
-        language = "Unknown (No Transcription)"
-
-        return jsonify({
-            'success': True,
-            'filepath': output_path,
-            'filename': output_filename,
-            'reference_text': reference_text,
-            'is_english': is_english,
-            'language': language
-        })
-
-    except Exception as e:
-        logger.exception(f"Error extracting audio segment: {e}")
-        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+    # Execute ffmpeg
+    try:
+        # Use capture_output=True to get stderr for debugging if needed
+        result = run_ffmpeg(ffmpeg_args, check=True, capture_output=True, text=True, encoding='utf-8')
+
+        logger.debug(f"ffmpeg stdout:\n{result.stdout}")
+        logger.debug(f"ffmpeg stderr:\n{result.stderr}")
+    except FileNotFoundError:
+        logger.error("ffmpeg command not found. Ensure ffmpeg is installed and in the system PATH.")
+        return jsonify({'error': 'ffmpeg not found. Please install ffmpeg.'}), 500
+    except subprocess.CalledProcessError as e:
+        logger.error(f"ffmpeg command failed with exit code {e.returncode}")
+        logger.error(f"ffmpeg stderr:\n{e.stderr}")
+        # Try to delete potentially incomplete output file
+        if os.path.exists(output_path): os.remove(output_path)
+        return jsonify({'error': f'ffmpeg failed: {e.stderr[:200]}...'}), 500
+
+    # --- Skip transcription - handled by frontend ---
+    reference_text = ""
+    is_english = True
+    language = "Unknown (No Transcription)"
+
+    return jsonify({
+        'success': True,
+        'filepath': output_path,
+        'filename': output_filename,
+        'reference_text': reference_text,
+        'is_english': is_english,
+        'language': language
+    })
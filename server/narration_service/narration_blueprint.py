@@ -1,11 +1,15 @@
 import os
+import re
 import logging
-from flask import Blueprint, send_file, jsonify
-from .narration_config import REFERENCE_AUDIO_DIR, OUTPUT_AUDIO_DIR
+from urllib.parse import quote
+from flask import Blueprint, Response, send_file, jsonify, request
+from werkzeug.exceptions import HTTPException
+from .narration_config import REFERENCE_AUDIO_DIR, OUTPUT_AUDIO_DIR, X_ACCEL_AUDIO_PREFIX
 from .narration_models import models_bp
 from .narration_audio import audio_bp
 from .narration_generation import generation_bp
 from .narration_edge_gtts import edge_gtts_bp
+from .directory_utils import is_audio_known_missing, mark_audio_missing
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +22,27 @@ narration_bp.register_blueprint(audio_bp, url_prefix='')
 narration_bp.register_blueprint(generation_bp, url_prefix='')
 narration_bp.register_blueprint(edge_gtts_bp, url_prefix='')
 
+# Audio roots resolved once at startup (the reference dir may itself be a symlink into
+# /dev/shm). Requested paths are resolved the same way, so a symlink inside a root can't
+# point outside it, and the trailing separator stops '/output_evil' matching '/output'.
+_AUDIO_ROOTS = {base_dir: os.path.realpath(base_dir) + os.sep
+                for base_dir in (OUTPUT_AUDIO_DIR, REFERENCE_AUDIO_DIR)}
+
+# Per-subtitle output files: subtitle_<id>/<name>
+_SUBTITLE_AUDIO_RE = re.compile(r'subtitle_[^/]+/[^/]+')
+
+@narration_bp.errorhandler(Exception)
+def handle_unexpected_error(e):
+    """
+    Single JSON 500 for errors a route doesn't handle itself, so routes only catch the
+    exceptions they expect. HTTP errors (400, 404, 413, ...) keep their status code but are
+    answered as JSON too, since the frontend parses every narration response as JSON.
+    """
+    if isinstance(e, HTTPException):
+        return jsonify({'error': e.description}), e.code
+    logger.exception(f"Error in {request.endpoint}: {e}")
+    return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+
 # Add routes for serving audio files
 @narration_bp.route('/audio/<path:filename>', methods=['GET'])
 def get_audio_file(filename):
@@ -26,59 +51,67 @@ def get_audio_file(filename):
     if '..' in filename or filename.startswith('/'):
         return jsonify({'error': 'Invalid filename'}), 400
 
+    if is_audio_known_missing(filename):
+        return jsonify({'error': 'File not found'}), 404
+
     logger.debug(f"Serving audio file: {filename}")
 
-    # Check if this is our new directory structure (subtitle_ID/number.wav)
-    parts = filename.split('/')
-    if len(parts) == 2 and parts[0].startswith('subtitle_'):
-        subtitle_dir = parts[0]
-        audio_file = parts[1]
-
-        # Build the path to the audio file
-        output_path = os.path.join(OUTPUT_AUDIO_DIR, subtitle_dir, audio_file)
-        safe_output_path = os.path.abspath(output_path)
-
-        logger.debug(f"Checking new structure path: {safe_output_path}")
-
-        if safe_output_path.startswith(os.path.abspath(OUTPUT_AUDIO_DIR)) and os.path.exists(safe_output_path):
-            logger.debug(f"Found file at new structure path: {safe_output_path}")
-            return send_file(safe_output_path, mimetype='audio/wav')
-        else:
-            logger.debug(f"File not found at new structure path: {safe_output_path}")
-
-    # Check reference directory first
-    reference_path = os.path.join(REFERENCE_AUDIO_DIR, filename)
-    # Use safe join and check existence within the intended directory
-    safe_ref_path = os.path.abspath(reference_path)
-    if safe_ref_path.startswith(os.path.abspath(REFERENCE_AUDIO_DIR)) and os.path.exists(safe_ref_path):
-        logger.debug(f"Serving reference audio: {safe_ref_path}")
-        return send_file(safe_ref_path, mimetype='audio/wav') # Assume WAV, adjust if needed
-
-    # Check output directory - handle legacy structure
-    output_path = os.path.join(OUTPUT_AUDIO_DIR, filename)
-    safe_output_path = os.path.abspath(output_path)
-    if safe_output_path.startswith(os.path.abspath(OUTPUT_AUDIO_DIR)) and os.path.exists(safe_output_path):
-        logger.debug(f"Serving output audio: {safe_output_path}")
-        return send_file(safe_output_path, mimetype='audio/wav') # Assume WAV
-
-    # If file not found, log directory contents for debugging
+    # Subtitle outputs (subtitle_ID/number.wav) live in the output dir, so look there first;
+    # anything else is checked in the reference dir, then the legacy flat output dir
+    if _SUBTITLE_AUDIO_RE.fullmatch(filename):
+        search_dirs = (OUTPUT_AUDIO_DIR, REFERENCE_AUDIO_DIR)
+    else:
+        search_dirs = (REFERENCE_AUDIO_DIR, OUTPUT_AUDIO_DIR)
+
+    for base_dir in search_dirs:
+        root = _AUDIO_ROOTS[base_dir]
+        audio_path = os.path.realpath(os.path.join(root, filename))
+        if not audio_path.startswith(root):
+            continue
+        if X_ACCEL_AUDIO_PREFIX:
+            if os.path.isfile(audio_path):
+                # nginx serves the file itself from an internal location, e.g.
+                # location /_protected_audio/output/ { internal; alias <OUTPUT_AUDIO_DIR>/; }
+                logger.debug(f"Serving audio: {audio_path}")
+                dir_key = 'output' if base_dir == OUTPUT_AUDIO_DIR else 'reference'
+                response = Response(mimetype='audio/wav')
+                response.headers['X-Accel-Redirect'] = f"{X_ACCEL_AUDIO_PREFIX}/{dir_key}/{quote(filename)}"
+                return response
+            continue
+        # send_file stats the path once for Content-Length, ETag and Last-Modified, so let it
+        # double as the existence check instead of stat-ing beforehand.
+        # conditional=True lets Werkzeug answer Range and If-None-Match requests itself.
+        # Speed/trim edits rewrite narration files in place, so clients must revalidate
+        # (max_age=0); unchanged files then cost a 304 instead of the full body.
+        try:
+            response = send_file(audio_path, mimetype='audio/wav', conditional=True,
+                                 etag=True, max_age=0) # Assume WAV
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            continue
+        logger.debug(f"Serving audio: {audio_path}")
+        return response
+
     logger.warning(f"Audio file not found in reference or output dirs: {filename}")
-    try:
-        logger.debug(f"Contents of OUTPUT_AUDIO_DIR: {os.listdir(OUTPUT_AUDIO_DIR)}")
-
-        # Check if there are any subtitle directories
-        subtitle_dirs = [d for d in os.listdir(OUTPUT_AUDIO_DIR)
-                        if d.startswith('subtitle_') and
-                        os.path.isdir(os.path.join(OUTPUT_AUDIO_DIR, d))]
-
-        if subtitle_dirs:
-            logger.debug(f"Found subtitle directories: {', '.join(subtitle_dirs)}")
-
-            # Check the contents of the first few subtitle directories
-            for i, dir_name in enumerate(subtitle_dirs[:3]):
-                dir_path = os.path.join(OUTPUT_AUDIO_DIR, dir_name)
-                logger.debug(f"Contents of {dir_path}: {os.listdir(dir_path)}")
-    except Exception as e:
-        logger.error(f"Error listing directory contents: {str(e)}")
+    mark_audio_missing(filename)
+
+    # Listing directory contents is only useful (and only worth the syscalls) when debugging
+    if logger.isEnabledFor(logging.DEBUG):
+        try:
+            with os.scandir(OUTPUT_AUDIO_DIR) as entries:
+                entries = list(entries)
+            logger.debug(f"Contents of OUTPUT_AUDIO_DIR: {[entry.name for entry in entries]}")
+
+            # Check if there are any subtitle directories
+            subtitle_dirs = [entry for entry in entries
+                             if entry.name.startswith('subtitle_') and entry.is_dir()]
+
+            if subtitle_dirs:
+                logger.debug(f"Found subtitle directories: {', '.join(entry.name for entry in subtitle_dirs)}")
+
+                # Check the contents of the first few subtitle directories
+                for entry in subtitle_dirs[:3]:
+                    logger.debug(f"Contents of {entry.path}: {os.listdir(entry.path)}")
+        except Exception as e:
+            logger.error(f"Error listing directory contents: {str(e)}")
 
     return jsonify({'error': 'File not found'}), 404
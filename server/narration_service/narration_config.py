@@ -2,7 +2,7 @@ import os
 import logging
 import sys
 import codecs
-import torch
+import threading
 
 # Set up logging with UTF-8 encoding
 # Force UTF-8 encoding for stdout and stderr if not already set
@@ -33,9 +33,113 @@ NARRATION_DIR = os.path.join(APP_ROOT_DIR, 'narration')
 REFERENCE_AUDIO_DIR = os.path.join(NARRATION_DIR, 'reference')
 OUTPUT_AUDIO_DIR = os.path.join(NARRATION_DIR, 'output')
 
+# When running behind nginx, hand audio downloads off with X-Accel-Redirect to this internal
+# location prefix (e.g. /_protected_audio) instead of streaming them through Python
+X_ACCEL_AUDIO_PREFIX = os.environ.get('NARRATION_X_ACCEL_PREFIX', '').rstrip('/')
+
+# Upper bound for a reference clip upload, in bytes of audio (base64 bodies may be 4/3 larger)
+MAX_REFERENCE_AUDIO_BYTES = int(os.environ.get('NARRATION_MAX_REFERENCE_MB', 50)) * 1024 * 1024
+
+# Compile the F5-TTS DiT transformer with torch.compile on CUDA. Opt in with
+# F5TTS_TORCH_COMPILE=1: the first generation after a model load stalls for the compile
+# (can be a minute or more), later sampling steps run fused kernels with less Python overhead.
+# F5TTS_TORCH_COMPILE=tensorrt builds fp16 TensorRT engines instead (needs torch_tensorrt).
+_TORCH_COMPILE_SETTING = os.environ.get('F5TTS_TORCH_COMPILE', '').lower()
+TORCH_COMPILE = _TORCH_COMPILE_SETTING in ('1', 'true', 'inductor', 'tensorrt')
+TORCH_COMPILE_BACKEND = 'tensorrt' if _TORCH_COMPILE_SETTING == 'tensorrt' else 'inductor'
+
+# Optional RAM-backed storage for reference audio (Linux only). Reference clips are written
+# once per upload and read back by F5-TTS, so keeping them on tmpfs removes disk IO from that
+# path. Opt in with NARRATION_REFERENCE_TMPFS=1; the reference dir becomes a symlink into
+# /dev/shm so the Node server keeps using the same path.
+SHM_ROOT = '/dev/shm'
+SHM_REFERENCE_DIR = os.path.join(SHM_ROOT, 'narration_refs')
+REFERENCE_TMPFS_TTL = int(os.environ.get('NARRATION_REFERENCE_TMPFS_TTL', 3600))
+
+
+def _link_reference_dir_to_tmpfs():
+    """Point REFERENCE_AUDIO_DIR at a tmpfs directory. Returns True if it is RAM-backed."""
+    link_target = os.path.realpath(REFERENCE_AUDIO_DIR)
+    if link_target.startswith(SHM_ROOT + os.sep):
+        # Linked by an earlier run; tmpfs is emptied on reboot, so recreate the target if needed
+        try:
+            os.makedirs(link_target, exist_ok=True)
+            return True
+        except OSError as e:
+            logger.warning(f"Could not recreate tmpfs reference audio dir {link_target}: {e}")
+            return False
+    if not os.path.isdir(SHM_ROOT):
+        logger.warning(f"NARRATION_REFERENCE_TMPFS is set but {SHM_ROOT} is not available.")
+        return False
+    # Never replace a directory that already holds reference audio
+    if os.path.isdir(REFERENCE_AUDIO_DIR) and os.listdir(REFERENCE_AUDIO_DIR):
+        logger.warning(f"Not moving non-empty {REFERENCE_AUDIO_DIR} to tmpfs.")
+        return False
+    try:
+        os.makedirs(SHM_REFERENCE_DIR, exist_ok=True)
+        if os.path.islink(REFERENCE_AUDIO_DIR):
+            os.unlink(REFERENCE_AUDIO_DIR)
+        elif os.path.isdir(REFERENCE_AUDIO_DIR):
+            os.rmdir(REFERENCE_AUDIO_DIR)
+        os.symlink(SHM_REFERENCE_DIR, REFERENCE_AUDIO_DIR, target_is_directory=True)
+        logger.info(f"Reference audio is stored on tmpfs: {SHM_REFERENCE_DIR}")
+        return True
+    except OSError as e:
+        logger.warning(f"Could not link reference audio dir to tmpfs: {e}")
+        return False
+
+
+def _prepare_reference_dir(use_tmpfs):
+    """Create the reference audio dir, on tmpfs when use_tmpfs is set. Returns True if it is RAM-backed."""
+    on_tmpfs = use_tmpfs and _link_reference_dir_to_tmpfs()
+    # A link whose target is gone (left by an earlier tmpfs run) is replaced by a plain directory
+    if os.path.islink(REFERENCE_AUDIO_DIR) and not os.path.exists(REFERENCE_AUDIO_DIR):
+        os.unlink(REFERENCE_AUDIO_DIR)
+    os.makedirs(REFERENCE_AUDIO_DIR, exist_ok=True)
+    return on_tmpfs
+
+
+def touch_reference_audio(path):
+    """
+    Mark a tmpfs reference clip as used, so the TTL eviction (which goes by mtime) doesn't remove
+    a reference the frontend still has selected. Paths outside the reference dir are left alone.
+    """
+    if not REFERENCE_ON_TMPFS:
+        return
+    reference_root = os.path.realpath(REFERENCE_AUDIO_DIR) + os.sep
+    if os.path.realpath(path).startswith(reference_root):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+
+def _evict_stale_reference_audio():
+    """Background loop bounding tmpfs usage by removing reference clips unused for the TTL."""
+    import time
+    while True:
+        time.sleep(max(60, REFERENCE_TMPFS_TTL // 4))
+        cutoff = time.time() - REFERENCE_TMPFS_TTL
+        try:
+            with os.scandir(REFERENCE_AUDIO_DIR) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file() and entry.stat().st_mtime < cutoff:
+                            os.unlink(entry.path)
+                    except OSError:
+                        pass
+        except OSError as e:
+            logger.warning(f"Error evicting stale reference audio: {e}")
+
+
 # Create directories if they don't exist
 os.makedirs(NARRATION_DIR, exist_ok=True)
-os.makedirs(REFERENCE_AUDIO_DIR, exist_ok=True)
+REFERENCE_ON_TMPFS = _prepare_reference_dir(
+    bool(os.environ.get('NARRATION_REFERENCE_TMPFS')) and sys.platform.startswith('linux')
+)
+if REFERENCE_ON_TMPFS:
+    threading.Thread(target=_evict_stale_reference_audio, name='reference-audio-evictor',
+                     daemon=True).start()
 os.makedirs(OUTPUT_AUDIO_DIR, exist_ok=True)
 
 
@@ -67,6 +171,8 @@ def _arch_list_supports_device(arch_list, device_arch):
 
 
 def _detect_best_torch_device():
+    import torch
+
     info = {
         "cuda_available": False,
         "selected_device": "cpu",
@@ -108,8 +214,8 @@ def _detect_best_torch_device():
             )
             return "cpu", info
 
+        # The test allocation that confirms the device works is left to verify_cuda_device()
         selected_device = "cuda:0"
-        _ = torch.tensor([1.0, 2.0], device=selected_device)
         info["arch_compatible"] = True
         info["selected_device"] = selected_device
         return selected_device, info
@@ -118,38 +224,89 @@ def _detect_best_torch_device():
         return "cpu", info
 
 # --- F5-TTS Initialization ---
-try:
-    device, CUDA_RUNTIME_INFO = _detect_best_torch_device()
-    if device.startswith("cuda"):
-        logger.info(
-            f"Using CUDA device {device} ({CUDA_RUNTIME_INFO['device_name']}, "
-            f"{CUDA_RUNTIME_INFO['device_arch']}) for narration."
-        )
-    else:
-        logger.warning(
-            f"Using CPU for narration. {CUDA_RUNTIME_INFO['reason'] or 'CUDA is not available.'}"
-        )
+# torch is slow to import and probing CUDA creates a context, so both are deferred until a
+# request actually needs F5-TTS (status, models or generation); Edge/gTTS and audio serving
+# never pay for them.
+_f5tts_init_lock = threading.Lock()
+_f5tts_initialized = False
 
 
+def init_f5tts():
+    """Run the F5-TTS/torch device checks once; returns HAS_F5TTS"""
+    global HAS_F5TTS, INIT_ERROR, device, CUDA_RUNTIME_INFO, _f5tts_initialized
+    if _f5tts_initialized:
+        return HAS_F5TTS
+    with _f5tts_init_lock:
+        if _f5tts_initialized:
+            return HAS_F5TTS
+        try:
+            device, CUDA_RUNTIME_INFO = _detect_best_torch_device()
+            if device.startswith("cuda"):
+                logger.info(
+                    f"Using CUDA device {device} ({CUDA_RUNTIME_INFO['device_name']}, "
+                    f"{CUDA_RUNTIME_INFO['device_arch']}) for narration."
+                )
+            else:
+                logger.warning(
+                    f"Using CPU for narration. {CUDA_RUNTIME_INFO['reason'] or 'CUDA is not available.'}"
+                )
 
-    # Import from model_manager package instead of modelManager.py
-    from model_manager import initialize_registry
-    # Initialize registry to ensure default model is registered
-    initialize_registry()
 
 
-    # Set flag to indicate F5-TTS is available
-    HAS_F5TTS = True
-    INIT_ERROR = None
+            # Import from model_manager package instead of modelManager.py
+            from model_manager import initialize_registry
+            # Initialize registry to ensure default model is registered
+            initialize_registry()
 
 
-except ImportError as e:
-    logger.warning(f"F5-TTS library or dependencies not found. Narration features will be disabled. Error: {e}")
-    HAS_F5TTS = False
-    INIT_ERROR = f"F5-TTS or dependency not found: {str(e)}"
-    device = None # No device relevant if library missing
-except Exception as e:
-    logger.error(f"Error during F5-TTS initialization checks: {e}", exc_info=True)
-    HAS_F5TTS = False
-    INIT_ERROR = f"Error initializing F5-TTS environment: {str(e)}"
-    device = None
+            # Set flag to indicate F5-TTS is available
+            HAS_F5TTS = True
+            INIT_ERROR = None
+
+
+        except ImportError as e:
+            logger.warning(f"F5-TTS library or dependencies not found. Narration features will be disabled. Error: {e}")
+            HAS_F5TTS = False
+            INIT_ERROR = f"F5-TTS or dependency not found: {str(e)}"
+            device = None # No device relevant if library missing
+        except Exception as e:
+            logger.error(f"Error during F5-TTS initialization checks: {e}", exc_info=True)
+            HAS_F5TTS = False
+            INIT_ERROR = f"Error initializing F5-TTS environment: {str(e)}"
+            device = None
+        _f5tts_initialized = True
+    return HAS_F5TTS
+
+
+_cuda_verified = False
+
+
+def verify_cuda_device():
+    """
+    Allocate a small tensor on the selected CUDA device once, falling back to CPU if it fails.
+    Called on the first generation request instead of at init, because the allocation creates
+    the CUDA context (seconds, and hundreds of MB of VRAM) that status checks don't need.
+    """
+    global device, _cuda_verified
+    if _cuda_verified or not (device or '').startswith('cuda'):
+        return device
+    with _f5tts_init_lock:
+        if not _cuda_verified:
+            try:
+                import torch
+                _ = torch.tensor([1.0, 2.0], device=device)
+                # The heavy math runs on the GPU; one intra-op CPU thread avoids BLAS/OpenMP
+                # oversubscription next to the inference, writer and request threads.
+                # An explicit OMP_NUM_THREADS is left alone.
+                if 'OMP_NUM_THREADS' not in os.environ:
+                    torch.set_num_threads(1)
+            except Exception as e:
+                logger.warning(f"CUDA device {device} failed to initialize; using CPU for narration. {e}")
+                CUDA_RUNTIME_INFO.update({
+                    "selected_device": "cpu",
+                    "arch_compatible": False,
+                    "reason": f"CUDA available but failed to initialize/use: {e}",
+                })
+                device = "cpu"
+            _cuda_verified = True
+    return device
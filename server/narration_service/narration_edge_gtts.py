@@ -1,33 +1,54 @@
 import os
 import uuid
+import itertools
+import functools
+import importlib.util
+import time
 import logging
-import json
 import asyncio
-import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from flask import Blueprint, request, jsonify, Response
 from .narration_config import OUTPUT_AUDIO_DIR
-from .directory_utils import ensure_subtitle_directory, get_next_file_number
+from .directory_utils import ensure_subtitle_directory, get_next_file_number, clear_missing_audio
+from .narration_utils import sse_event
 
 logger = logging.getLogger(__name__)
 
 # Create blueprint for edge-tts and gtts routes
 edge_gtts_bp = Blueprint('narration_edge_gtts', __name__)
 
-# Check if edge-tts and gtts are available
+# Use uvloop for the Edge TTS event loop when it is installed (not available on Windows)
 try:
-    import edge_tts
-    HAS_EDGE_TTS = True
-    logger.info("edge-tts library is available")
+    from uvloop import new_event_loop as _new_event_loop
 except ImportError:
-    HAS_EDGE_TTS = False
+    _new_event_loop = asyncio.new_event_loop
+
+# Number of Edge TTS requests run concurrently for one generation request
+EDGE_TTS_CONCURRENCY = int(os.environ.get('EDGE_TTS_CONCURRENCY', '8'))
+
+# Unique generated-file names without a clock read per file
+_FILENAME_PREFIX = uuid.uuid4().hex[:8]
+_filename_counter = itertools.count()
+
+# Edge voice list changes rarely; fetching it is a full HTTPS round-trip to Microsoft
+_VOICES_CACHE_TTL = 3600
+_voices_cache = (0.0, None)
+
+# Shared worker pool for gTTS requests (each one blocks on HTTPS)
+_tts_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('GTTS_WORKERS', '8')),
+                               thread_name_prefix='gtts')
+
+# Check if edge-tts and gtts are available; they are imported on first use
+HAS_EDGE_TTS = importlib.util.find_spec('edge_tts') is not None
+if HAS_EDGE_TTS:
+    logger.info("edge-tts library is available")
+else:
     logger.warning("edge-tts library is not available")
 
-try:
-    from gtts import gTTS
-    HAS_GTTS = True
+HAS_GTTS = importlib.util.find_spec('gtts') is not None
+if HAS_GTTS:
     logger.info("gtts library is available")
-except ImportError:
-    HAS_GTTS = False
+else:
     logger.warning("gtts library is not available")
 
 @edge_gtts_bp.route('/edge-tts/generate', methods=['POST'])
@@ -54,69 +75,80 @@ def generate_edge_tts():
         
         def generate():
             try:
-                yield f"data: {json.dumps({'status': 'started', 'total': len(subtitles)})}\n\n"
+                yield sse_event({'status': 'started', 'total': len(subtitles)})
             except Exception as e:
                 logger.info("Client disconnected during Edge TTS generation start")
                 return
 
-            results = []
-            for i, subtitle in enumerate(subtitles):
-                try:
-                    # Generate audio using edge-tts
-                    audio_data = asyncio.run(generate_edge_tts_audio(
-                        subtitle['text'], voice, rate, volume, pitch
-                    ))
-
-                    # Save audio file
-                    subtitle_id = subtitle.get('id', i)
-                    filename = save_audio_file(audio_data, subtitle_id, 'edge-tts')
-
-                    result = {
-                        'subtitle_id': subtitle_id,
-                        'text': subtitle['text'],
-                        'start_time': subtitle.get('start', 0),
-                        'end_time': subtitle.get('end', 0),
-                        'filename': filename,
-                        'success': True,
-                        'method': 'edge-tts'
-                    }
-                    results.append(result)
-
-                    # Send progress update
-                    progress_data = {
-                        'status': 'progress',
-                        'current': i + 1,
-                        'total': len(subtitles),
-                        'result': result
-                    }
+            async def synthesize(i, subtitle, semaphore):
+                """Generate one subtitle; returns (index, result, error message or None)"""
+                subtitle_id = subtitle.get('id', i)
+                async with semaphore:
                     try:
-                        yield f"data: {json.dumps(progress_data)}\n\n"
+                        # Stream the audio straight into the output file
+                        filename, filepath = new_audio_file_path(subtitle_id, 'edge-tts')
+                        await generate_edge_tts_audio(
+                            subtitle['text'], voice, rate, volume, pitch, filepath
+                        )
                     except Exception as e:
-                        logger.info(f"Client disconnected during Edge TTS generation at subtitle {i+1}")
-                        return
-
-                except Exception as e:
-                    logger.error(f"Error generating Edge TTS for subtitle {i}: {str(e)}")
-                    error_result = {
-                        'subtitle_id': subtitle.get('id', i),
-                        'text': subtitle['text'],
-                        'success': False,
-                        'error': str(e),
-                        'method': 'edge-tts'
-                    }
-                    results.append(error_result)
-
-                    error_data = {
-                        'status': 'error',
-                        'current': i + 1,
-                        'total': len(subtitles),
-                        'result': error_result
-                    }
+                        logger.error(f"Error generating Edge TTS for subtitle {i}: {str(e)}")
+                        return i, {
+                            'subtitle_id': subtitle_id,
+                            'text': subtitle['text'],
+                            'success': False,
+                            'error': str(e),
+                            'method': 'edge-tts'
+                        }, str(e)
+
+                return i, {
+                    'subtitle_id': subtitle_id,
+                    'text': subtitle['text'],
+                    'start_time': subtitle.get('start', 0),
+                    'end_time': subtitle.get('end', 0),
+                    'filename': filename,
+                    'success': True,
+                    'method': 'edge-tts'
+                }, None
+
+            # Requests to the Edge service are network-bound, so run several at once on one
+            # event loop and report each subtitle as soon as it finishes
+            loop = _new_event_loop()
+            semaphore = asyncio.Semaphore(EDGE_TTS_CONCURRENCY)
+            pending = {loop.create_task(synthesize(i, subtitle, semaphore))
+                       for i, subtitle in enumerate(subtitles)}
+            results = [None] * len(subtitles)
+            completed = 0
+            try:
+                while pending:
+                    done, pending = loop.run_until_complete(
+                        asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    )
+                    # Subtitles that finished together go out in a single write
+                    events = []
+                    for task in done:
+                        i, result, error = task.result()
+                        results[i] = result
+                        completed += 1
+
+                        # Queue progress (or error) update
+                        events.append(sse_event({
+                            'status': 'error' if error else 'progress',
+                            'current': completed,
+                            'total': len(subtitles),
+                            'result': result
+                        }))
                     try:
-                        yield f"data: {json.dumps(error_data)}\n\n"
+                        yield b"".join(events)
                     except Exception as e:
-                        logger.info(f"Client disconnected during Edge TTS error reporting at subtitle {i+1}")
+                        logger.info(f"Client disconnected during Edge TTS generation at subtitle {completed}")
                         return
+            finally:
+                # On disconnect, stop outstanding requests (they remove their partial files)
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+                loop.close()
 
             # Send completion
             completion_data = {
@@ -124,7 +156,7 @@ def generate_edge_tts():
                 'results': results
             }
             try:
-                yield f"data: {json.dumps(completion_data)}\n\n"
+                yield sse_event(completion_data)
             except Exception as e:
                 logger.info("Client disconnected during Edge TTS completion")
                 return
@@ -158,67 +190,75 @@ def generate_gtts():
         
         def generate():
             try:
-                yield f"data: {json.dumps({'status': 'started', 'total': len(subtitles)})}\n\n"
+                yield sse_event({'status': 'started', 'total': len(subtitles)})
             except Exception as e:
                 logger.info("Client disconnected during gTTS generation start")
                 return
 
-            results = []
+            # Each gTTS call blocks on an HTTPS request, so run them on the shared pool and
+            # report subtitles as soon as their audio arrives
+            futures = {}
             for i, subtitle in enumerate(subtitles):
-                try:
-                    # Generate audio using gTTS
-                    audio_data = generate_gtts_audio(subtitle['text'], lang, tld, slow)
-
-                    # Save audio file
-                    subtitle_id = subtitle.get('id', i)
-                    filename = save_audio_file(audio_data, subtitle_id, 'gtts')
-
-                    result = {
-                        'subtitle_id': subtitle_id,
-                        'text': subtitle['text'],
-                        'start_time': subtitle.get('start', 0),
-                        'end_time': subtitle.get('end', 0),
-                        'filename': filename,
-                        'success': True,
-                        'method': 'gtts'
-                    }
-                    results.append(result)
-
-                    # Send progress update
-                    progress_data = {
-                        'status': 'progress',
-                        'current': i + 1,
-                        'total': len(subtitles),
-                        'result': result
-                    }
-                    try:
-                        yield f"data: {json.dumps(progress_data)}\n\n"
-                    except Exception as e:
-                        logger.info(f"Client disconnected during gTTS generation at subtitle {i+1}")
-                        return
-
-                except Exception as e:
-                    logger.error(f"Error generating gTTS for subtitle {i}: {str(e)}")
-                    error_result = {
-                        'subtitle_id': subtitle.get('id', i),
-                        'text': subtitle['text'],
-                        'success': False,
-                        'error': str(e),
-                        'method': 'gtts'
-                    }
-                    results.append(error_result)
-
-                    error_data = {
-                        'status': 'error',
-                        'current': i + 1,
-                        'total': len(subtitles),
-                        'result': error_result
-                    }
+                filename, filepath = new_audio_file_path(subtitle.get('id', i), 'gtts')
+                future = _tts_pool.submit(generate_gtts_audio, subtitle['text'], lang, tld, slow, filepath)
+                futures[future] = (i, subtitle, filename)
+            results = [None] * len(subtitles)
+            completed = 0
+            try:
+                pending = set(futures)
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                    # Subtitles that finished together go out in a single write
+                    events = []
+                    for future in done:
+                        i, subtitle, filename = futures[future]
+                        subtitle_id = subtitle.get('id', i)
+                        completed += 1
+                        try:
+                            # Re-raise any error from the worker
+                            future.result()
+
+                            result = {
+                                'subtitle_id': subtitle_id,
+                                'text': subtitle['text'],
+                                'start_time': subtitle.get('start', 0),
+                                'end_time': subtitle.get('end', 0),
+                                'filename': filename,
+                                'success': True,
+                                'method': 'gtts'
+                            }
+                            status = 'progress'
+
+                        except Exception as e:
+                            logger.error(f"Error generating gTTS for subtitle {i}: {str(e)}")
+                            result = {
+                                'subtitle_id': subtitle_id,
+                                'text': subtitle['text'],
+                                'success': False,
+                                'error': str(e),
+                                'method': 'gtts'
+                            }
+                            status = 'error'
+
+                        results[i] = result
+
+                        # Queue progress (or error) update
+                        events.append(sse_event({
+                            'status': status,
+                            'current': completed,
+                            'total': len(subtitles),
+                            'result': result
+                        }))
                     try:
-                        yield f"data: {json.dumps(error_data)}\n\n"
+                        yield b"".join(events)
                     except Exception as e:
-                        logger.info(f"Client disconnected during gTTS error reporting at subtitle {i+1}")
+                        logger.info(f"Client disconnected during gTTS generation at subtitle {completed}")
                         return
+            finally:
+                # On disconnect, drop the requests that have not started yet
+                for future in futures:
+                    future.cancel()
 
             # Send completion
             completion_data = {
@@ -226,7 +266,7 @@ def generate_gtts():
                 'results': results
             }
             try:
-                yield f"data: {json.dumps(completion_data)}\n\n"
+                yield sse_event(completion_data)
             except Exception as e:
                 logger.info("Client disconnected during gTTS completion")
                 return
@@ -237,71 +277,55 @@ def generate_gtts():
         logger.error(f"Error in gTTS generation: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-async def generate_edge_tts_audio(text, voice, rate, volume, pitch):
-    """Generate audio using Edge TTS"""
-    # Create SSML with voice settings
-    ssml = f"""
-    <speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="en-US">
-        <voice name="{voice}">
-            <prosody rate="{rate}" volume="{volume}" pitch="{pitch}">
-                {text}
-            </prosody>
-        </voice>
-    </speak>
-    """
-    
-    communicate = edge_tts.Communicate(ssml, voice)
-    audio_data = b""
-    
-    async for chunk in communicate.stream():
-        if chunk["type"] == "audio":
-            audio_data += chunk["data"]
-    
-    return audio_data
+async def generate_edge_tts_audio(text, voice, rate, volume, pitch, filepath):
+    """Generate audio using Edge TTS, writing each received chunk straight to filepath"""
+    import edge_tts
 
-def generate_gtts_audio(text, lang, tld, slow):
-    """Generate audio using gTTS"""
-    tts = gTTS(text=text, lang=lang, tld=tld, slow=slow)
+    # edge-tts builds the SSML itself (and escapes the text it is given), so pass plain text
+    # and let it apply the prosody settings
+    communicate = edge_tts.Communicate(text, voice, rate=rate, volume=volume, pitch=pitch)
 
-    # Save to temporary file and read the data
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3')
     try:
-        tts.save(temp_file.name)
-        temp_file.close()  # Close the file handle before reading
-
-        with open(temp_file.name, 'rb') as f:
-            audio_data = f.read()
-
-        return audio_data
-    finally:
-        # Clean up temporary file
+        with open(filepath, 'wb', buffering=1 << 16) as f:
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    f.write(chunk["data"])
+    except BaseException:
+        # Don't leave a truncated file behind for the frontend to pick up
         try:
-            os.unlink(temp_file.name)
+            os.unlink(filepath)
         except OSError:
-            pass  # Ignore if file is already deleted
+            pass
+        raise
 
-def save_audio_file(audio_data, subtitle_id, method):
-    """Save audio data to file and return filename"""
-    try:
-        # Ensure output directory exists (create if needed)
-        os.makedirs(OUTPUT_AUDIO_DIR, exist_ok=True)
+    clear_missing_audio()
+    logger.info(f"Saved edge-tts audio: {os.path.basename(filepath)}")
 
-        # Generate unique filename with timestamp to avoid conflicts
-        import time
-        timestamp = int(time.time() * 1000)  # milliseconds
-        filename = f"{method}_{timestamp}_{subtitle_id}.mp3"
-        filepath = os.path.join(OUTPUT_AUDIO_DIR, filename)
+def generate_gtts_audio(text, lang, tld, slow, filepath):
+    """Generate audio using gTTS, writing the MP3 to filepath as it is received"""
+    from gtts import gTTS
+    tts = gTTS(text=text, lang=lang, tld=tld, slow=slow)
 
-        # Write audio data
-        with open(filepath, 'wb') as f:
-            f.write(audio_data)
+    try:
+        with open(filepath, 'wb', buffering=1 << 16) as f:
+            tts.write_to_fp(f)
+    except BaseException:
+        # Don't leave a truncated file behind for the frontend to pick up
+        try:
+            os.unlink(filepath)
+        except OSError:
+            pass
+        raise
 
-        logger.info(f"Saved {method} audio: {filename}")
-        return filename
+    clear_missing_audio()
+    logger.info(f"Saved gtts audio: {os.path.basename(filepath)}")
 
-    except Exception as e:
-        logger.error(f"Error saving {method} audio file: {str(e)}")
-        raise
+def new_audio_file_path(subtitle_id, method):
+    """Build a unique (filename, filepath) in OUTPUT_AUDIO_DIR for a generated MP3"""
+    # OUTPUT_AUDIO_DIR is created by narration_config at import time
+    # Per-process prefix plus a counter keeps names unique across concurrent saves and restarts
+    filename = f"{method}_{_FILENAME_PREFIX}{next(_filename_counter):06d}_{subtitle_id}.mp3"
+    return filename, os.path.join(OUTPUT_AUDIO_DIR, filename)
 
 @edge_gtts_bp.route('/edge-tts/voices', methods=['GET'])
 def get_edge_tts_voices():
@@ -309,7 +333,13 @@ def get_edge_tts_voices():
     if not HAS_EDGE_TTS:
         return jsonify({'error': 'edge-tts library is not available'}), 503
     
+    global _voices_cache
+    fetched_at, cached_voices = _voices_cache
+    if cached_voices and time.monotonic() - fetched_at < _VOICES_CACHE_TTL:
+        return jsonify({'voices': cached_voices})
+
     try:
+        import edge_tts
         voices = asyncio.run(edge_tts.list_voices())
         # Format voices for frontend
         formatted_voices = []
@@ -322,13 +352,32 @@ def get_edge_tts_voices():
                 'language': voice['Locale'].split('-')[0],
                 'display_name': f"{voice['FriendlyName']} ({voice['Locale']})"
             })
-        
+
+        _voices_cache = (time.monotonic(), formatted_voices)
         return jsonify({'voices': formatted_voices})
         
     except Exception as e:
         logger.error(f"Error getting Edge TTS voices: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+_GTTS_LANGS_TTL = 86400
+
+@functools.lru_cache(maxsize=1)
+def _get_gtts_languages(ttl_bucket):
+    """Fetch and format the gTTS language table; ttl_bucket rolls over to force a refresh"""
+    from gtts.lang import tts_langs
+    languages = tts_langs()
+
+    # Format languages for frontend
+    formatted_languages = []
+    for code, name in languages.items():
+        formatted_languages.append({
+            'code': code,
+            'name': name,
+            'display_name': f"{name} ({code})"
+        })
+    return formatted_languages
+
 @edge_gtts_bp.route('/gtts/languages', methods=['GET'])
 def get_gtts_languages():
     """Get available gTTS languages"""
@@ -336,18 +385,8 @@ def get_gtts_languages():
         return jsonify({'error': 'gtts library is not available'}), 503
     
     try:
-        from gtts.lang import tts_langs
-        languages = tts_langs()
-        
-        # Format languages for frontend
-        formatted_languages = []
-        for code, name in languages.items():
-            formatted_languages.append({
-                'code': code,
-                'name': name,
-                'display_name': f"{name} ({code})"
-            })
-        
+        # Refreshed once a day; the table is effectively static
+        formatted_languages = _get_gtts_languages(int(time.monotonic() // _GTTS_LANGS_TTL))
         return jsonify({'languages': formatted_languages})
         
     except Exception as e:
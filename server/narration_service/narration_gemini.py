@@ -2,28 +2,116 @@ import os
 import json
 import logging
 import time
+import urllib3
 from .narration_config import APP_ROOT_DIR
 
 logger = logging.getLogger(__name__)
 
+# orjson is optional; both parsers accept bytes
+try:
+    from orjson import loads as json_loads, dumps as _json_dumps
+except ImportError:
+    json_loads = json.loads
+
+    def _json_dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+
+# Shared urllib3 pool for Gemini calls, so consecutive requests reuse pooled keep-alive
+# connections instead of paying a TCP+TLS handshake each time. Going straight to urllib3
+# skips the requests session/PreparedRequest machinery on this single hot endpoint.
+_pool = urllib3.PoolManager(num_pools=4, maxsize=20)
+
+# post_json retries connection failures (nothing was sent) and 5xx responses a few times with
+# backoff, honouring Retry-After. A read timeout is not retried, because the request may already
+# have been processed. A 429 isn't retried either: the key is still rate-limited, repeats only
+# burn quota, and the right response is to use another key.
+_RETRY_STATUSES = frozenset((500, 502, 503, 504))
+_MAX_RETRIES = 3
+_BACKOFF_FACTOR = 0.3
+
+def _retry_delay(response, attempt):
+    """Seconds to wait before retry number attempt + 1"""
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return _BACKOFF_FACTOR * (2 ** attempt)
+
+def post_json(url, payload, headers, timeout):
+    """
+    POST a JSON payload through the shared pool and return (status, body bytes). timeout is the
+    wall-clock budget for the whole call, retries and backoff included; a retry that wouldn't fit
+    isn't attempted. Connection errors and timeouts raise urllib3.exceptions.HTTPError subclasses.
+    """
+    body = _json_dumps(payload)
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    while True:
+        response = None
+        try:
+            response = _pool.request(
+                'POST', url,
+                body=body,
+                headers=headers,
+                timeout=urllib3.Timeout(total=max(deadline - time.monotonic(), 0.001)),
+                retries=False,
+            )
+        except urllib3.exceptions.ConnectTimeoutError:
+            # Also covers refused and unresolvable connections (NewConnectionError)
+            if attempt >= _MAX_RETRIES or time.monotonic() + _retry_delay(None, attempt) >= deadline:
+                raise
+        else:
+            if (response.status not in _RETRY_STATUSES or attempt >= _MAX_RETRIES
+                    or time.monotonic() + _retry_delay(response, attempt) >= deadline):
+                return response.status, response.data
+        time.sleep(_retry_delay(response, attempt))
+        attempt += 1
+
 # Dictionary to track failed API keys and their retry times
 _failed_api_keys = {}
 # Blacklist duration in seconds (5 minutes)
 _BLACKLIST_DURATION = 5 * 60
 
+# Parsed config.json/localStorage.json, keyed by path -> (mtime_ns, size, data), so the files
+# are only re-read when they change
+_json_cache = {}
+
+def _load_json_cached(path):
+    """Load a JSON file, reusing the parsed copy while its mtime and size are unchanged.
+    Returns None if the file doesn't exist; the returned object must not be modified."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    cached = _json_cache.get(path)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    with open(path, 'rb') as f:
+        data = json_loads(f.read())
+    _json_cache[path] = (st.st_mtime_ns, st.st_size, data)
+    return data
+
+# Result of get_all_gemini_api_keys, reused for a few seconds
+_KEYS_TTL = 5.0
+_keys_cache = {"ts": 0.0, "keys": None}
+# Deployments whose keys never change at runtime can set GEMINI_KEYS_STATIC=1 to read the key
+# sources only once; call reload_keys() (narrationApp does on SIGHUP) to pick up rotated keys.
+# Off by default because the app writes newly added keys to localStorage.json while it runs.
+KEYS_STATIC = os.environ.get('GEMINI_KEYS_STATIC', '').lower() in ('1', 'true')
+# Shared blacklist as last read from localStorage.json, reused for the same few seconds
+_shared_blacklist_cache = {"ts": 0.0, "blacklist": None}
+
 def _get_shared_blacklist():
     """Read the browser-shared key blacklist (key -> expiry epoch seconds) from localStorage.json,
     so a key the frontend rate-limited is also skipped here. JS stores expiry in milliseconds."""
     blacklist = {}
     try:
-        localStorage_path = os.path.join(APP_ROOT_DIR, 'localStorage.json')
-        if not os.path.exists(localStorage_path):
+        localStorage_data = _load_json_cached(os.path.join(APP_ROOT_DIR, 'localStorage.json'))
+        if localStorage_data is None:
             return blacklist
-        with open(localStorage_path, 'r', encoding='utf-8') as f:
-            raw = json.load(f).get('gemini_blacklisted_keys')
+        raw = localStorage_data.get('gemini_blacklisted_keys')
         if not raw:
             return blacklist
-        obj = json.loads(raw) if isinstance(raw, str) else raw
+        obj = json_loads(raw) if isinstance(raw, str) else raw
         if isinstance(obj, dict):
             for key, expiry_ms in obj.items():
                 try:
@@ -34,6 +122,15 @@ def _get_shared_blacklist():
         logger.error(f"Error reading shared Gemini key blacklist: {e}")
     return blacklist
 
+def _get_shared_blacklist_cached():
+    """Return the shared blacklist, re-reading localStorage.json only when the cached copy is stale"""
+    blacklist = _shared_blacklist_cache["blacklist"]
+    if blacklist is None or time.monotonic() - _shared_blacklist_cache["ts"] >= _KEYS_TTL:
+        blacklist = _get_shared_blacklist()
+        _shared_blacklist_cache["blacklist"] = blacklist
+        _shared_blacklist_cache["ts"] = time.monotonic()
+    return blacklist
+
 def get_gemini_api_key():
     """Get Gemini API key from various sources with failover support"""
     # Get all available keys
@@ -46,7 +143,7 @@ def get_gemini_api_key():
     # Filter out keys that are cooling down — either locally (this process) or per the blacklist
     # shared from the browser, so the two processes agree on which keys are exhausted.
     current_time = time.time()
-    shared_blacklist = _get_shared_blacklist()
+    shared_blacklist = _get_shared_blacklist_cached()
 
     def _is_blacklisted(key):
         if key in _failed_api_keys and current_time <= _failed_api_keys[key]:
@@ -75,10 +172,24 @@ def blacklist_api_key(api_key):
         return
 
     _failed_api_keys[api_key] = time.time() + _BLACKLIST_DURATION
+    # Re-read the key sources on the next lookup
+    _keys_cache["ts"] = 0.0
     logger.warning(f"Blacklisted Gemini API key for {_BLACKLIST_DURATION} seconds")
 
 def get_all_gemini_api_keys():
-    """Get all available Gemini API keys from various sources"""
+    """Get all available Gemini API keys from various sources, as a tuple"""
+    # Back-to-back lookups in one burst reuse the keys computed a moment ago
+    cached_keys = _keys_cache["keys"]
+    if cached_keys is not None and (KEYS_STATIC or time.monotonic() - _keys_cache["ts"] < _KEYS_TTL):
+        return cached_keys
+
+    keys = _read_gemini_api_keys()
+    _keys_cache["keys"] = keys
+    _keys_cache["ts"] = time.monotonic()
+    return keys
+
+def _read_gemini_api_keys():
+    """Read the Gemini API keys from the environment, config.json and localStorage.json"""
     keys = []
 
     # First try environment variable
@@ -89,44 +200,42 @@ def get_all_gemini_api_keys():
     # Try to read from a config file
     try:
         config_path = os.path.join(APP_ROOT_DIR, 'config.json')
-        if os.path.exists(config_path):
-            with open(config_path, 'r', encoding='utf-8') as config_file:
-                config = json.load(config_file)
-                # Check for single key
-                if config.get('gemini_api_key'):
-                    keys.append(config.get('gemini_api_key'))
-                # Check for multiple keys
-                if config.get('gemini_api_keys') and isinstance(config.get('gemini_api_keys'), list):
-                    keys.extend(config.get('gemini_api_keys'))
+        config = _load_json_cached(config_path)
+        if config is not None:
+            # Check for single key
+            if config.get('gemini_api_key'):
+                keys.append(config.get('gemini_api_key'))
+            # Check for multiple keys
+            if config.get('gemini_api_keys') and isinstance(config.get('gemini_api_keys'), list):
+                keys.extend(config.get('gemini_api_keys'))
     except Exception as e:
         logger.error(f"Error reading config file ({config_path}): {e}")
 
     # Try to read from localStorage.json file (saved from browser localStorage)
     try:
         localStorage_path = os.path.join(APP_ROOT_DIR, 'localStorage.json')
-        if os.path.exists(localStorage_path):
-            with open(localStorage_path, 'r', encoding='utf-8') as localStorage_file:
-                localStorage_data = json.load(localStorage_file)
-                # Check for single key (legacy)
-                if localStorage_data.get('gemini_api_key'):
-                    keys.append(localStorage_data.get('gemini_api_key'))
-                # Check for multiple keys
-                if localStorage_data.get('gemini_api_keys'):
-                    try:
-                        multi_keys = json.loads(localStorage_data.get('gemini_api_keys'))
-                        if isinstance(multi_keys, list):
-                            keys.extend(multi_keys)
-                    except json.JSONDecodeError:
-                        logger.error("Error parsing gemini_api_keys from localStorage.json")
+        localStorage_data = _load_json_cached(localStorage_path)
+        if localStorage_data is not None:
+            # Check for single key (legacy)
+            if localStorage_data.get('gemini_api_key'):
+                keys.append(localStorage_data.get('gemini_api_key'))
+            # Check for multiple keys
+            if localStorage_data.get('gemini_api_keys'):
+                try:
+                    multi_keys = json_loads(localStorage_data.get('gemini_api_keys'))
+                    if isinstance(multi_keys, list):
+                        keys.extend(multi_keys)
+                except json.JSONDecodeError:
+                    logger.error("Error parsing gemini_api_keys from localStorage.json")
     except Exception as e:
         logger.error(f"Error reading localStorage file ({localStorage_path}): {e}")
 
-    # Remove duplicates while preserving order
-    unique_keys = []
-    for key in keys:
-        if key and key not in unique_keys:
-            unique_keys.append(key)
+    # Remove duplicates while preserving order; a tuple so the cached snapshot can be shared
+    return tuple(dict.fromkeys(key for key in keys if key))
 
-    return unique_keys
+def reload_keys():
+    """Re-read the Gemini key sources on the next lookup (needed when GEMINI_KEYS_STATIC is set)"""
+    _keys_cache["keys"] = None
+    logger.info("Gemini API keys will be reloaded")
 
 
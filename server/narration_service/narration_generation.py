@@ -1,21 +1,34 @@
 import os
 import uuid
 import logging
-import json
 import time
 import contextlib
-import torch
-import gc
+import functools
 import re
-import requests
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from flask import Blueprint, request, jsonify, Response
-from .narration_config import HAS_F5TTS, OUTPUT_AUDIO_DIR
-from .narration_utils import load_tts_model
+from .narration_config import OUTPUT_AUDIO_DIR, init_f5tts, verify_cuda_device, touch_reference_audio
+from .narration_utils import get_tts_model, put_tts_model, compile_tts_model, sse_event, json_bytes
+from .narration_gemini import post_json, json_loads
 
-from .directory_utils import ensure_subtitle_directory, get_next_file_number
+from .directory_utils import allocate_subtitle_outputs, clear_missing_audio
 
 logger = logging.getLogger(__name__)
 
+_GEMINI_NORMALIZE_URL = 'https://generativelanguage.googleapis.com/v1beta/models/gemini-flash-lite-latest:generateContent'
+
+# C0 control characters (except tab, LF, CR) and DEL, stripped from subtitle and reference
+# text; str.translate deletes them in one C-level pass
+_CONTROL_CHARS = dict.fromkeys([*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20), 0x7F])
+
+@functools.lru_cache(maxsize=16)
+def _gemini_headers(api_key):
+    """Request headers for a Gemini key, built once per key (urllib3 copies them, never mutates)"""
+    return {
+        'Content-Type': 'application/json',
+        'x-goog-api-key': api_key
+    }
+
 def normalize_gen_text(text, api_key=None, language='vi'):
     """Normalize text for F5-TTS generation by removing disruptive punctuation and converting numbers/dates to spoken words."""
     if not text:
@@ -47,34 +60,33 @@ def normalize_gen_text(text, api_key=None, language='vi'):
 
 Text: {text}"""
 
-                response = requests.post(
-                    'https://generativelanguage.googleapis.com/v1beta/models/gemini-flash-lite-latest:generateContent',
-                    headers={
-                        'Content-Type': 'application/json',
-                        'x-goog-api-key': api_key
-                    },
-                    json={
+                status, body = post_json(
+                    _GEMINI_NORMALIZE_URL,
+                    {
                         'contents': [{
                             'parts': [{
                                 'text': prompt
                             }]
                         }]
                     },
+                    _gemini_headers(api_key),
                     timeout=10
                 )
 
-                if response.status_code == 200:
-                    result = response.json()
-                    if 'candidates' in result and result['candidates']:
+                if status == 200:
+                    result = json_loads(body)
+                    try:
                         converted_text = result['candidates'][0]['content']['parts'][0]['text'].strip()
-                        if converted_text and converted_text != pre_gemini_text:
-                            transformations['transformed'] = True
-                            # Track what was converted
-                            if has_numbers:
-                                transformations['numbers_converted'] = ['numbers']
-                            if has_dates:
-                                transformations['dates_converted'] = ['dates']
-                            text = converted_text
+                    except (KeyError, IndexError, TypeError, AttributeError):
+                        converted_text = ''
+                    if converted_text and converted_text != pre_gemini_text:
+                        transformations['transformed'] = True
+                        # Track what was converted
+                        if has_numbers:
+                            transformations['numbers_converted'] = ['numbers']
+                        if has_dates:
+                            transformations['dates_converted'] = ['dates']
+                        text = converted_text
 
         except Exception as e:
             logger.warning(f"Failed to normalize text with Gemini: {e}")
@@ -82,13 +94,67 @@ Text: {text}"""
 
     return text, transformations
 
+# Shared pool for prefetching Gemini text normalisation (each call blocks on HTTPS)
+_normalize_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('GEMINI_NORMALIZE_WORKERS', '4')),
+                                     thread_name_prefix='gemini-normalize')
+
+# Single inference thread shared by all requests: it serialises GPU work on the resident model
+# and lets each request's stream write files and events while the next batch is sampled
+_inference_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='f5tts-infer')
+
+# Writer threads for generated waves; F5TTS.export_wav goes through soundfile (libsndfile),
+# which releases the GIL, so a batch's files are written in parallel
+_write_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='narration-write')
+
+# Byte templates for the per-subtitle SSE frames; constant keys are baked in and only the
+# values that can carry user content go through the JSON encoder
+_PROCESSING_EVENT = (b'data: {"type":"progress","message_key":"processingSubtitle","current":%d,"total":%d,'
+                     b'"subtitle_id":%b,"subtitle_text":%b,"processing_started":true}\n\n')
+_GENERATING_EVENT = (b'data: {"type":"progress","message":%b,"current":%d,"total":%d,'
+                     b'"subtitle_id":%b,"generating":true}\n\n')
+_RESULT_EVENT = b'data: {"type":"result","result":%b,"progress":%d,"total":%d}\n\n'
+
+# SSE comment frame sent while the stream waits on inference or normalisation, so clients and
+# proxies with read timeouts don't drop the connection during long batches
+_SSE_KEEPALIVE = b": keepalive\n\n"
+_SSE_KEEPALIVE_SECONDS = 5
+
+def _wait_with_keepalive(future):
+    """Generator: yield keepalive frames until future completes, then return its result"""
+    while True:
+        try:
+            return future.result(timeout=_SSE_KEEPALIVE_SECONDS)
+        except FutureTimeoutError:
+            yield _SSE_KEEPALIVE
+
+# Subtitles generated per padded F5-TTS call when the client doesn't send batchSize, and a
+# rough per-subtitle VRAM budget used to shrink larger batches on smaller GPUs
+DEFAULT_BATCH_SIZE = 4
+_BATCH_ITEM_VRAM_MB = int(os.environ.get('F5TTS_BATCH_ITEM_VRAM_MB', '1024'))
+
+def _cap_batch_size(batch_size, device, is_cuda):
+    """Clamp the requested batch size to at least 1 and to what the free VRAM can hold"""
+    try:
+        batch_size = max(1, int(batch_size))
+    except (TypeError, ValueError):
+        batch_size = DEFAULT_BATCH_SIZE
+
+    if is_cuda:
+        import torch
+        try:
+            free_bytes, _ = torch.cuda.mem_get_info(device)
+            batch_size = min(batch_size, max(1, free_bytes // (_BATCH_ITEM_VRAM_MB * 1024 * 1024)))
+        except Exception as e:
+            logger.debug(f"Could not query free VRAM for batch sizing: {e}")
+    return batch_size
+
 # Create blueprint for generation routes
 generation_bp = Blueprint('narration_generation', __name__)
 
 @generation_bp.route('/generate', methods=['POST', 'HEAD'])
 def generate_narration():
     """Generate narration for subtitles using F5-TTS (Streaming Response)"""
-    if not HAS_F5TTS:
+    if not init_f5tts():
         logger.error("Generate request received but F5-TTS is not available.")
         return jsonify({'error': 'F5-TTS service is not available'}), 503
 
@@ -102,6 +168,14 @@ def generate_narration():
         return response
 
     # --- Process POST Request ---
+    verify_cuda_device()
+    import torch
+    # The device is settled once verify_cuda_device has run; resolve it once per request
+    from .narration_config import device
+    is_cuda = device.startswith("cuda") and torch.cuda.is_available()
+    # Ensure device context if needed (though F5TTS internal handling might suffice)
+    device_context = (lambda: torch.cuda.device(device)) if is_cuda else contextlib.nullcontext
+    tts_model_instance = None
     try:
         data = request.json
         if not data:
@@ -124,22 +198,27 @@ def generate_narration():
         if not os.path.exists(reference_audio):
             logger.error(f"Reference audio file does not exist: {reference_audio}")
             return jsonify({'error': f'Reference audio file not found: {reference_audio}'}), 404
+        # Keep a tmpfs reference clip that is still being used from the TTL eviction
+        touch_reference_audio(reference_audio)
 
         # --- Load Model ---
-        # Load model instance specifically for this request to ensure isolation
+        # Reuses the resident model when it is the one requested; loads (and keeps) it otherwise
         try:
-            tts_model_instance, loaded_model_id = load_tts_model(requested_model_id)
+            tts_model_instance, loaded_model_id = get_tts_model(requested_model_id)
 
         except Exception as model_load_error:
              logger.error(f"Failed to load TTS model for generation: {model_load_error}", exc_info=True)
              # Return error before starting stream
              return jsonify({'error': f'Failed to load TTS model: {model_load_error}'}), 500
 
+        # Opt-in torch.compile; the compile itself happens lazily during the first batch
+        model_compiled = compile_tts_model(tts_model_instance)
+
         # --- Prepare Settings ---
         remove_silence = settings.get('removeSilence', True)
         speed = float(settings.get('speechRate', 1.0))
-        # Batch size isn't directly used by F5TTS.infer for single text, remove unless needed
-        # batch_size = settings.get('batchSize', 10) # This seems unused for item-by-item generation
+        # Subtitles sampled together in one padded model call, capped by free VRAM
+        batch_size = _cap_batch_size(settings.get('batchSize', DEFAULT_BATCH_SIZE), device, is_cuda)
         nfe_step = int(settings.get('nfeStep', 32)) # Default from F5TTS if not specified
         sway_coef = float(settings.get('swayCoef', -1.0)) # Default from F5TTS
         cfg_strength = float(settings.get('cfgStrength', 2.0)) # Default from F5TTS
@@ -148,20 +227,195 @@ def generate_narration():
 
 
 
+        # Reference text is the same for every subtitle in the request
+        cleaned_ref_text = (reference_text or "").translate(_CONTROL_CHARS)
+
+        # Every inference future this request submits; release_model holds the model until they finish
+        inference_futures = []
+
         # --- Define Streaming Generator ---
         def generate_narration_stream():
-            # Make the model instance accessible in this scope
-            nonlocal tts_model_instance, loaded_model_id
-
-            results = []
             total_subtitles = len(subtitles)
+            # One slot per subtitle so results stay in subtitle order whatever the batching
+            results = [None] * total_subtitles
             processed_count = 0
             start_time_generation = time.time()
 
             # Language mismatch check removed per user request
 
+            # Batches are padded to their longest text, so when batching, walk the subtitles shortest
+            # first to keep each batch's lengths close (stable sort: ties keep request order).
+            # Events carry subtitle_id and results keep their slots, so the client sees no difference.
+            if batch_size > 1:
+                order = sorted(range(total_subtitles), key=lambda i: len(subtitles[i].get('text', '')))
+            else:
+                order = range(total_subtitles)
+
+            # Gemini normalisation costs one HTTPS round-trip per subtitle; start all of them up
+            # front on the shared pool so they overlap with inference instead of preceding it
+            gemini_api_key = settings.get('gemini_api_key')
+            # Get language from settings, default to 'vi' for backward compatibility
+            language = settings.get('language', 'vi')
+            pending_normalizations = {}
+            if gemini_api_key:
+                # Submitted in processing order so the first normalisations needed finish first
+                for i in order:
+                    text = subtitles[i].get('text', '').strip()
+                    if text:
+                        pending_normalizations[i] = _normalize_pool.submit(
+                            normalize_gen_text,
+                            text.translate(_CONTROL_CHARS),
+                            gemini_api_key, language
+                        )
+
+            # Reference preprocessing (clip/trim, transcription of an empty ref_text) is the same for
+            # every subtitle, so it runs once on the first batch instead of inside each infer call
+            reference = None
+            reference_failed = False
+
+            def infer_items(batch, tts):
+                """
+                Runs on the inference thread. Returns one (wave, error) pair per item; a None wave
+                with no error means F5TTS.infer already wrote the file itself. tts is passed in
+                rather than read from the enclosing scope, which release_model clears.
+                """
+                nonlocal reference, reference_failed
+                from .f5tts_inference import prepare_reference, infer_batch, infer_single
+
+                if reference is None and not reference_failed:
+                    try:
+                        reference = prepare_reference(reference_audio, cleaned_ref_text)
+                    except Exception as ref_error:
+                        # Fall back to F5TTS.infer, which preprocesses the reference per subtitle
+                        logger.warning(f"Could not prepare reference audio once for this request: {ref_error}")
+                        reference_failed = True
+
+                infer_kwargs = {
+                    'speed': speed, 'nfe_step': nfe_step, 'sway_sampling_coef': sway_coef,
+                    'cfg_strength': cfg_strength, 'seed': seed
+                }
+                def infer_one(item):
+                    if reference is not None:
+                        return infer_single(tts, reference, item['params']['gen_text'], **infer_kwargs)
+                    tts.infer(**item['params'])
+                    return None
+
+                # One device context per batch (one cudaSetDevice) around the batched call and any
+                # one-by-one fallback, instead of one per subtitle
+                with device_context():
+                    # One padded sample call for the whole batch; if it fails, redo the items one by one
+                    # so a single bad subtitle is reported on its own instead of failing its neighbours
+                    if len(batch) > 1 and reference is not None:
+                        try:
+                            waves = infer_batch(
+                                tts, reference,
+                                [item['params']['gen_text'] for item in batch], **infer_kwargs
+                            )
+                            return [(wave, None) for wave in waves]
+                        except Exception as batch_error:
+                            logger.warning(f"Batched inference of {len(batch)} subtitles failed, retrying one at a time: {batch_error}", exc_info=True)
+                            if isinstance(batch_error, torch.cuda.OutOfMemoryError):
+                                torch.cuda.empty_cache()
+
+                    outcomes = []
+                    for item in batch:
+                        try:
+                            try:
+                                wave = infer_one(item)
+                            except torch.cuda.OutOfMemoryError:
+                                # The caching allocator keeps freed blocks for reuse; only hand them back
+                                # to the driver when an allocation actually fails, then retry once
+                                logger.warning(f"CUDA out of memory on subtitle ID {item['original_id']}, clearing the cache and retrying")
+                                torch.cuda.empty_cache()
+                                wave = infer_one(item)
+                            outcomes.append((wave, None))
+                        except Exception as infer_error:
+                            outcomes.append((None, infer_error))
+                    return outcomes
+
+            def emit_results(batch, outcomes):
+                """Write each generated wave to disk and yield a result/error event per subtitle"""
+                # Start all of the batch's writes (and optional silence removal) at once, then report
+                # them in order as they finish
+                writes = [
+                    _write_pool.submit(tts_model_instance.export_wav, wave, item['params']['file_wave'], remove_silence)
+                    if wave is not None else None
+                    for item, (wave, _) in zip(batch, outcomes)
+                ]
+                for item, (_, infer_error), write in zip(batch, outcomes, writes):
+                    original_id = item['original_id']
+                    cleaned_text = item['params']['gen_text']
+                    try:
+                        if infer_error is not None:
+                            raise infer_error
+                        if write is not None:
+                            yield from _wait_with_keepalive(write)
+                        clear_missing_audio()
+
+
+                        result = {
+                            'subtitle_id': original_id,
+                            'text': cleaned_text, # Return the cleaned text used for generation
+                            'original_text': item['original_text'], # Include original text for display
+                            'audio_path': item['params']['file_wave'],
+                            'filename': item['full_filename'], # Return the path relative to OUTPUT_AUDIO_DIR
+                            'success': True,
+                            'transformations': item['transformations']
+                        }
+                        results[item['index']] = result
+
+                        # Send success result
+                        yield _RESULT_EVENT % (json_bytes(result), item['progress'], total_subtitles)
+
+                    except Exception as infer_error:
+                        # Log the specific error and the text that caused it
+                        logger.error(f"Error generating narration for subtitle ID {original_id} with text '{cleaned_text[:100]}...': {infer_error}", exc_info=True) # Log stack trace
+                        error_message = f"{type(infer_error).__name__}: {str(infer_error)}"
+                        result = {
+                            'subtitle_id': original_id,
+                            'text': cleaned_text,
+                            'original_text': item['original_text'],
+                            'error': error_message,
+                            'success': False,
+                            'transformations': item['transformations']
+                        }
+                        results[item['index']] = result
+
+                        # Send error result
+                        error_data = {'type': 'error', 'result': result, 'progress': item['progress'], 'total': total_subtitles}
+                        yield sse_event(error_data)
+
+            # Inference runs one batch ahead on the shared inference thread: while the GPU samples
+            # batch k+1, this generator writes batch k's files and streams its events
+            in_flight = None  # (batch, future)
+
+            def dispatch(batch):
+                """Queue batch for inference (None to just drain), then emit the previous batch's results"""
+                nonlocal in_flight
+                previous = in_flight
+                in_flight = None
+                if batch:
+                    in_flight = (batch, _inference_pool.submit(infer_items, batch, tts_model_instance))
+                    inference_futures.append(in_flight[1])
+                if previous is not None:
+                    outcomes = yield from _wait_with_keepalive(previous[1])
+                    yield from emit_results(previous[0], outcomes)
+
+            pending_batch = []
+            stream_closed = False
             try:
-                for i, subtitle in enumerate(subtitles):
+                # Create every output directory and pick its file number up front, in one pass
+                subtitle_outputs = allocate_subtitle_outputs(
+                    i + 1 for i, subtitle in enumerate(subtitles) if subtitle.get('text', '').strip()
+                )
+
+                if model_compiled:
+                    # Let the client know why the first result takes much longer than the rest
+                    compiling_data = {'type': 'progress', 'message': 'Compiling the TTS model, the first subtitle may take a minute...', 'current': 0, 'total': total_subtitles}
+                    yield sse_event(compiling_data)
+
+                for i in order:
+                    subtitle = subtitles[i]
                     # Keep the original stable ID for UI/logic, but use a per-request sequential index for output directories
                     original_id = subtitle.get('id', f"index_{i}")  # may be non-sequential across sessions
                     display_idx = i + 1  # 1-based, contiguous for this generation run
@@ -170,30 +424,18 @@ def generate_narration():
 
                     # --- Send Progress Update ---
                     subtitle_text = text[:50] + "..." if len(text) > 50 else text
-                    progress_data = {
-                        'type': 'progress',
-                        'message_key': 'processingSubtitle',
-                        'current': processed_count,
-                        'total': total_subtitles,
-                        'subtitle_id': original_id,  # keep reporting original id to the client
-                        'subtitle_text': subtitle_text,
-                        'processing_started': True
-                    }
-                    yield f"data: {json.dumps(progress_data)}\n\n"
+                    # keep reporting original id to the client
+                    yield _PROCESSING_EVENT % (processed_count, total_subtitles, json_bytes(original_id), json_bytes(subtitle_text))
 
                     if not text:
                         result = {'subtitle_id': original_id, 'text': '', 'success': True, 'skipped': True}
-                        results.append(result)
-                        skip_data = {'type': 'result', 'result': result, 'progress': processed_count, 'total': total_subtitles}
-                        yield f"data: {json.dumps(skip_data)}\n\n"
+                        results[i] = result
+                        yield _RESULT_EVENT % (json_bytes(result), processed_count, total_subtitles)
                         continue
 
                     # --- Prepare for Generation ---
-                    # Ensure the per-run sequential subtitle directory exists (subtitle_1..subtitle_N)
-                    subtitle_dir = ensure_subtitle_directory(display_idx)
-
-                    # Get the next file number for this subtitle
-                    file_number = get_next_file_number(subtitle_dir)
+                    # Per-run sequential subtitle directory (subtitle_1..subtitle_N) and its next file number
+                    subtitle_dir, file_number = subtitle_outputs[display_idx]
 
                     # Generate a filename with sequential numbering
                     filename = f"{file_number}.wav"
@@ -205,19 +447,16 @@ def generate_narration():
                     logger.debug(f"Generating narration audio for subtitle {original_id}, output path: {output_path}")
 
                     # Clean text: Remove control characters, ensure UTF-8
-                    cleaned_text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', text)
+                    cleaned_text = text.translate(_CONTROL_CHARS)
                     # Store original text before normalization
                     original_text = cleaned_text
-                    # Normalize text for better TTS pronunciation
-                    gemini_api_key = settings.get('gemini_api_key')
-                    # Get language from settings, default to 'vi' for backward compatibility
-                    language = settings.get('language', 'vi')
-                    cleaned_text, transformations = normalize_gen_text(cleaned_text, gemini_api_key, language)
+                    # Normalize text for better TTS pronunciation (prefetched when Gemini is used)
+                    if i in pending_normalizations:
+                        cleaned_text, transformations = yield from _wait_with_keepalive(pending_normalizations.pop(i))
+                    else:
+                        cleaned_text, transformations = normalize_gen_text(cleaned_text, None, language)
                     # Ensure string type and UTF-8 encoding (though F5TTS might handle bytes too)
                     # cleaned_text = cleaned_text.encode('utf-8').decode('utf-8')
-                    # Ensure reference text is also clean string
-                    cleaned_ref_text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', reference_text or "")
-                    # cleaned_ref_text = cleaned_ref_text.encode('utf-8').decode('utf-8')
 
                     # Log parameters clearly before calling infer
                     log_params = {
@@ -230,128 +469,86 @@ def generate_narration():
 
 
                     # --- Send Generating Update ---
-                    generating_data = {
-                        'type': 'progress',
-                        'message': f'Generating audio for subtitle {processed_count}/{total_subtitles} (ID: {original_id})',
-                        'current': processed_count,
-                        'total': total_subtitles,
-                        'subtitle_id': original_id,
-                        'generating': True
-                    }
-                    yield f"data: {json.dumps(generating_data)}\n\n"
-
-                    # --- Perform Inference ---
-                    try:
-                        # Use the loaded model instance
-                        # Ensure device context if needed (though F5TTS internal handling might suffice)
-                        from .narration_config import device
-                        context_manager = (
-                            torch.cuda.device(device)
-                            if device.startswith("cuda") and torch.cuda.is_available()
-                            else contextlib.nullcontext()
-                        )
-                        with context_manager:
-                             tts_model_instance.infer(**log_params)
-
-
-                        result = {
-                            'subtitle_id': original_id,
-                            'text': cleaned_text, # Return the cleaned text used for generation
-                            'original_text': original_text, # Include original text for display
-                            'audio_path': output_path,
-                            'filename': full_filename, # Return the path relative to OUTPUT_AUDIO_DIR
-                            'success': True,
-                            'transformations': transformations
-                        }
-                        results.append(result)
-
-                        # Send success result
-                        result_data = {'type': 'result', 'result': result, 'progress': processed_count, 'total': total_subtitles}
-                        yield f"data: {json.dumps(result_data)}\n\n"
-
-                    except Exception as infer_error:
-                        # Log the specific error and the text that caused it
-                        logger.error(f"Error generating narration for subtitle ID {original_id} with text '{cleaned_text[:100]}...': {infer_error}", exc_info=True) # Log stack trace
-                        error_message = f"{type(infer_error).__name__}: {str(infer_error)}"
-                        result = {
-                            'subtitle_id': original_id,
-                            'text': cleaned_text,
-                            'original_text': original_text,
-                            'error': error_message,
-                            'success': False,
-                            'transformations': transformations
-                        }
-                        results.append(result)
-
-                        # Send error result
-                        error_data = {'type': 'error', 'result': result, 'progress': processed_count, 'total': total_subtitles}
-                        # Use ensure_ascii=False for better Unicode in JSON, but handle errors
-                        try:
-                            json_payload = json.dumps(error_data, ensure_ascii=False)
-                        except UnicodeEncodeError:
-                            logger.warning("Falling back to ASCII JSON encoding due to Unicode error.")
-                            json_payload = json.dumps(error_data, ensure_ascii=True)
-                        yield f"data: {json_payload}\n\n"
-
-                    finally:
-                         # --- Memory Management ---
-                         # Try to free memory after each item, especially important for GPU
-                         try:
-                             gc.collect() # Force Python garbage collection
-                             if device.startswith("cuda") and torch.cuda.is_available():
-                                 torch.cuda.empty_cache()
-                                 # logger.debug(f"CUDA cache cleared after subtitle ID {original_id}")
-                         except Exception as mem_error:
-                              logger.warning(f"Error during memory cleanup after subtitle ID {original_id}: {mem_error}")
+                    yield _GENERATING_EVENT % (
+                        json_bytes(f'Generating audio for subtitle {processed_count}/{total_subtitles} (ID: {original_id})'),
+                        processed_count, total_subtitles, json_bytes(original_id)
+                    )
+
+                    # --- Queue for Inference ---
+                    pending_batch.append({
+                        'index': i, 'original_id': original_id, 'original_text': original_text,
+                        'full_filename': full_filename, 'transformations': transformations,
+                        'progress': processed_count, 'params': log_params
+                    })
+                    if len(pending_batch) >= batch_size:
+                        yield from dispatch(pending_batch)
+                        pending_batch = []
+
+                if pending_batch:
+                    yield from dispatch(pending_batch)
+                    pending_batch = []
+                yield from dispatch(None)
+
+            except GeneratorExit:
+                # The client went away. Yielding the completion event now would make close() raise,
+                # and Werkzeug would then skip release_model
+                stream_closed = True
+                raise
 
             except Exception as stream_err:
                  # Catch errors within the generator loop itself
                  logger.error(f"Error during narration stream generation: {stream_err}", exc_info=True)
                  error_data = {'type': 'fatal_error', 'error': f'Stream generation failed: {str(stream_err)}'}
-                 yield f"data: {json.dumps(error_data)}\n\n"
+                 yield sse_event(error_data)
 
             finally:
-                # --- Signal Completion ---
-                total_time = time.time() - start_time_generation
-
-                complete_data = {'type': 'complete', 'results': results, 'total': len(results), 'duration_seconds': total_time}
-                try:
-                    json_payload = json.dumps(complete_data, ensure_ascii=False)
-                except UnicodeEncodeError:
-                    json_payload = json.dumps(complete_data, ensure_ascii=True)
-                yield f"data: {json_payload}\n\n"
-
-                # --- Resource Cleanup ---
-                # Explicitly delete model instance to release resources if loaded per-request
-                logger.debug("Starting resource cleanup")
-                try:
-                    if tts_model_instance is not None:
-                        logger.debug("Deleting TTS model instance")
-                        del tts_model_instance
-                        tts_model_instance = None
-                        logger.debug("TTS model instance deleted successfully")
-                except Exception as del_err:
-                    logger.error(f"Error deleting TTS model instance: {del_err}", exc_info=True)
+                # Drop normalisations and inference that haven't started (e.g. the client disconnected)
+                for future in pending_normalizations.values():
+                    future.cancel()
+                for future in inference_futures:
+                    future.cancel()
 
+                # Return this request's cached GPU blocks to the driver once, now that it is done
                 try:
-                    logger.debug("Running garbage collection")
-                    gc.collect()
-                    from .narration_config import device
-                    if device.startswith("cuda") and torch.cuda.is_available():
-                        logger.debug("Clearing CUDA cache")
+                    if is_cuda:
                         torch.cuda.empty_cache()
-                        logger.debug("CUDA cache cleared")
                 except Exception as final_clean_err:
                     logger.warning(f"Error during final resource cleanup: {final_clean_err}")
 
-                logger.debug("Resource cleanup completed")
+                # --- Signal Completion ---
+                total_time = time.time() - start_time_generation
 
+                results = [result for result in results if result is not None]
+                complete_data = {'type': 'complete', 'results': results, 'total': len(results), 'duration_seconds': total_time}
+                if not stream_closed:
+                    yield sse_event(complete_data)
+
+
+        def release_model():
+            """
+            Hand the model back once the response is closed (finished, disconnected or never started)
+            and none of this request's inference still runs on it.
+            """
+            nonlocal tts_model_instance
+            instance, tts_model_instance = tts_model_instance, None
+            # The stream has cancelled its queued batches by now, but a batch the GPU already started
+            # can't be cancelled. The inference pool has a single worker, so the last future still
+            # pending finishes last; return the model from its done-callback
+            running = [future for future in inference_futures if not future.done()]
+            if running:
+                running[-1].add_done_callback(lambda _: put_tts_model(instance))
+            else:
+                put_tts_model(instance)
 
         # --- Return Streaming Response ---
 
-        return Response(generate_narration_stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+        response = Response(generate_narration_stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+        response.call_on_close(release_model)
+        return response
 
     except Exception as e:
         # Catch errors before starting the stream (e.g., request parsing)
         logger.exception(f"Error setting up narration generation: {e}")
+        if tts_model_instance is not None:
+            put_tts_model(tts_model_instance)
         return jsonify({'error': f'Failed to start generation: {str(e)}'}), 500
@@ -1,37 +1,57 @@
 import logging
 import re
 import string
+import functools
 
 logger = logging.getLogger(__name__)
 
+# Only the head of the text is analysed; the ratio thresholds below are stable on a
+# sample this size, and long transcripts would otherwise be lowercased and scanned whole
+_SAMPLE_LEN = 4096
+
+# Common English words (more comprehensive list could be used)
+_COMMON_ENGLISH_WORDS = frozenset({
+    'the', 'be', 'to', 'of', 'and', 'a', 'in', 'that', 'have', 'i', 'it', 'for', 'not', 'on', 'with',
+    'he', 'as', 'you', 'do', 'at', 'this', 'but', 'his', 'by', 'from', 'they', 'we', 'say', 'her', 'she',
+    'or', 'an', 'will', 'my', 'one', 'all', 'would', 'there', 'their', 'what', 'so', 'up', 'out', 'if',
+    'about', 'who', 'get', 'which', 'go', 'me', 'when', 'make', 'can', 'like', 'time', 'no', 'just', 'him',
+    'know', 'take', 'people', 'into', 'year', 'your', 'good', 'some', 'could', 'them', 'see', 'other', 'than',
+    'then', 'now', 'look', 'only', 'come', 'its', 'over', 'think', 'also', 'back', 'after', 'use', 'two',
+    'how', 'our', 'work', 'first', 'well', 'way', 'even', 'new', 'want', 'because', 'any', 'these', 'give',
+    'day', 'most', 'us', 'is', 'are', 'was', 'were'
+})
+
+# Runs of letters of any script, so accented words stay whole instead of leaving fragments
+# such as the "i" of "giới" that look like English words; digits and punctuation separate words
+_WORD_RE = re.compile(r'[^\W\d_]+')
+
+# Basic Latin letters, digits and space, as a str.translate table and as bytes to delete
+_DELETE_BASIC_LATIN = str.maketrans('', '', string.ascii_lowercase + string.digits + ' ')
+_BASIC_LATIN_BYTES = (string.ascii_lowercase + string.digits + ' ').encode('ascii')
+
+@functools.lru_cache(maxsize=4096)
 def is_text_english(text):
-    """Detect if the text is likely English using simple heuristics"""
+    """Detect if the text is likely English using simple heuristics over its first
+    _SAMPLE_LEN characters (memoized per text)"""
     try:
         if not text or not isinstance(text, str):
             return True  # Default to True for empty or non-string input
 
-        # Common English words (more comprehensive list could be used)
-        common_english_words = {
-            'the', 'be', 'to', 'of', 'and', 'a', 'in', 'that', 'have', 'i', 'it', 'for', 'not', 'on', 'with',
-            'he', 'as', 'you', 'do', 'at', 'this', 'but', 'his', 'by', 'from', 'they', 'we', 'say', 'her', 'she',
-            'or', 'an', 'will', 'my', 'one', 'all', 'would', 'there', 'their', 'what', 'so', 'up', 'out', 'if',
-            'about', 'who', 'get', 'which', 'go', 'me', 'when', 'make', 'can', 'like', 'time', 'no', 'just', 'him',
-            'know', 'take', 'people', 'into', 'year', 'your', 'good', 'some', 'could', 'them', 'see', 'other', 'than',
-            'then', 'now', 'look', 'only', 'come', 'its', 'over', 'think', 'also', 'back', 'after', 'use', 'two',
-            'how', 'our', 'work', 'first', 'well', 'way', 'even', 'new', 'want', 'because', 'any', 'these', 'give',
-            'day', 'most', 'us', 'is', 'are', 'was', 'were'
-        }
-
-        # Basic Latin alphabet + digits + space
-        basic_latin_chars = string.ascii_lowercase + string.digits + ' '
-        text_lower = text.lower()
+        text_lower = text[:_SAMPLE_LEN].lower()
 
         # 1. Character Set Analysis
         total_chars = len(text_lower)
         if total_chars == 0:
             return True
 
-        latin_char_count = sum(1 for char in text_lower if char in basic_latin_chars)
+        # Deleting the basic-Latin characters leaves the others; the scan runs in C.
+        # ASCII punctuation still counts as non-Latin, so pure-ASCII text is not skipped,
+        # but it takes the much cheaper bytes.translate path.
+        if text_lower.isascii():
+            other_chars = len(text_lower.encode('ascii').translate(None, _BASIC_LATIN_BYTES))
+        else:
+            other_chars = len(text_lower.translate(_DELETE_BASIC_LATIN))
+        latin_char_count = total_chars - other_chars
         non_latin_ratio = (total_chars - latin_char_count) / total_chars
 
         # If a significant portion (> 30%) is non-basic-Latin, assume non-English
@@ -40,15 +60,14 @@ def is_text_english(text):
             return False
 
         # 2. Common Word Analysis (if predominantly Latin chars)
-        # Remove punctuation more carefully
-        text_cleaned = re.sub(r'[^\w\s]', '', text_lower)
-        words = text_cleaned.split()
+        # Tokenize in one pass instead of stripping punctuation and then splitting
+        words = _WORD_RE.findall(text_lower)
         total_words = len(words)
 
         if total_words == 0:
             return True # Treat as English if only punctuation/spaces
 
-        english_word_count = sum(1 for word in words if word in common_english_words)
+        english_word_count = sum(1 for word in words if word in _COMMON_ENGLISH_WORDS)
         english_word_ratio = english_word_count / total_words
 
         # logger.debug(f"Text: '{text[:50]}...', Non-Latin Ratio: {non_latin_ratio:.2f}, Eng Word Ratio: {english_word_ratio:.2f}")
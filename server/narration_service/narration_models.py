@@ -1,8 +1,11 @@
 import logging
+import threading
+import time
 from flask import Blueprint, request, jsonify
 from urllib.parse import unquote
-from .narration_config import HAS_F5TTS, INIT_ERROR, device, CUDA_RUNTIME_INFO
-from .narration_gemini import get_gemini_api_key
+from . import narration_config
+from .narration_gemini import get_all_gemini_api_keys
+from .narration_utils import release_tts_model
 from model_manager import (
     get_models, get_active_model, set_active_model, add_model, delete_model,
     download_model_from_hf, download_model_from_url, parse_hf_url,
@@ -16,38 +19,59 @@ logger = logging.getLogger(__name__)
 # Create blueprint for model management routes
 models_bp = Blueprint('narration_models', __name__)
 
-@models_bp.route('/status', methods=['GET'])
-def get_status():
-    """Check if F5-TTS is available and other system status"""
-    runtime_device = device
+@models_bp.before_request
+def ensure_f5tts_initialized():
+    """Run the deferred torch/F5-TTS checks before the first status or model request"""
+    narration_config.init_f5tts()
+
+# The frontend polls /status. Its GPU fields come from CUDA driver calls that contend with a
+# running generation, so device properties are read once and the runtime check and memory
+# figures are reused for _STATUS_TTL seconds.
+_STATUS_TTL = 1.0
+_status_cache = {"ts": 0.0, "runtime": None, "device": None}
+_status_lock = threading.Lock()
+
+def _runtime_gpu_status():
+    """Return (runtime_device, runtime_cuda_available, gpu_info) from a runtime CUDA check"""
+    runtime_device = narration_config.device
     runtime_cuda_available = False
-    gpu_info = dict(CUDA_RUNTIME_INFO)
+    gpu_info = dict(narration_config.CUDA_RUNTIME_INFO)
 
-    if HAS_F5TTS:
+    if narration_config.HAS_F5TTS:
         # Perform runtime CUDA check as it might change (e.g., driver issues)
         try:
             import torch
             runtime_cuda_available = torch.cuda.is_available()
-            if device == "cuda:0" and not runtime_cuda_available:
+            if narration_config.device == "cuda:0" and not runtime_cuda_available:
                 logger.warning("Runtime Check: CUDA was previously detected but is now unavailable!")
                 runtime_device = "cuda_error" # Indicate discrepancy
-            elif runtime_cuda_available and device != "cuda:0" and CUDA_RUNTIME_INFO.get('arch_compatible', False):
-                 logger.warning(f"Runtime Check: CUDA is available but service is configured for {device}. Check initialization.")
+            elif runtime_cuda_available and narration_config.device != "cuda:0" and narration_config.CUDA_RUNTIME_INFO.get('arch_compatible', False):
+                 logger.warning(f"Runtime Check: CUDA is available but service is configured for {narration_config.device}. Check initialization.")
                  # Don't change runtime_device here, reflect configured state unless error
 
-            if runtime_cuda_available and CUDA_RUNTIME_INFO.get('arch_compatible', False):
+            if runtime_cuda_available and narration_config.CUDA_RUNTIME_INFO.get('arch_compatible', False):
                 gpu_info['cuda_available'] = True
-                current_dev_index = torch.cuda.current_device()
-                gpu_info['device_name'] = torch.cuda.get_device_name(current_dev_index)
-                gpu_info['device_count'] = torch.cuda.device_count()
-                gpu_info['current_device_index'] = current_dev_index
-                gpu_info['device_capability'] = torch.cuda.get_device_capability(current_dev_index)
+                # Device properties don't change while the process runs
+                device_props = _status_cache["device"]
+                if device_props is None:
+                    current_dev_index = torch.cuda.current_device()
+                    device_props = {
+                        'device_name': torch.cuda.get_device_name(current_dev_index),
+                        'device_count': torch.cuda.device_count(),
+                        'current_device_index': current_dev_index,
+                        'device_capability': torch.cuda.get_device_capability(current_dev_index),
+                    }
+                    _status_cache["device"] = device_props
+                gpu_info.update(device_props)
+                current_dev_index = device_props['current_device_index']
                 try:
                     # Report memory for the current device F5TTS is likely using
                     gpu_info['memory_allocated'] = f"{torch.cuda.memory_allocated(current_dev_index) / 1024**2:.2f} MB"
                     gpu_info['memory_reserved'] = f"{torch.cuda.memory_reserved(current_dev_index) / 1024**2:.2f} MB"
-                    total_memory = torch.cuda.get_device_properties(current_dev_index).total_memory
-                    gpu_info['total_memory'] = f"{total_memory / 1024**2:.2f} MB"
+                    if 'total_memory' not in device_props:
+                        total_memory = torch.cuda.get_device_properties(current_dev_index).total_memory
+                        device_props['total_memory'] = f"{total_memory / 1024**2:.2f} MB"
+                    gpu_info['total_memory'] = device_props['total_memory']
                 except Exception as mem_e:
                     logger.warning(f"Could not get detailed CUDA memory info: {mem_e}")
                     gpu_info['memory_info'] = "Error retrieving memory details"
@@ -55,24 +79,36 @@ def get_status():
         except Exception as e:
             logger.error(f"Error during runtime status check for CUDA: {e}")
             gpu_info['error'] = f"Runtime check error: {str(e)}"
-            if device == "cuda:0": # If we expected CUDA but check failed
+            if narration_config.device == "cuda:0": # If we expected CUDA but check failed
                 runtime_device = "cuda_error"
 
+    return runtime_device, runtime_cuda_available, gpu_info
+
+@models_bp.route('/status', methods=['GET'])
+def get_status():
+    """Check if F5-TTS is available and other system status"""
+    with _status_lock:
+        if _status_cache["runtime"] is None or time.monotonic() - _status_cache["ts"] >= _STATUS_TTL:
+            _status_cache["runtime"] = _runtime_gpu_status()
+            _status_cache["ts"] = time.monotonic()
+        runtime_device, runtime_cuda_available, gpu_info = _status_cache["runtime"]
+
     # Get model info from modelManager
     model_info = get_models()
 
     from .narration_config import REFERENCE_AUDIO_DIR, OUTPUT_AUDIO_DIR
 
     return jsonify({
-        'available': HAS_F5TTS,
+        'available': narration_config.HAS_F5TTS,
         'device': runtime_device, # Reflects intended device or error state
         'runtime_cuda_available': runtime_cuda_available, # Actual current state
-        'initialization_error': INIT_ERROR, # Error during startup
+        'initialization_error': narration_config.INIT_ERROR, # Error during startup
         'gpu_info': gpu_info,
         'models': model_info,
         'reference_audio_dir': REFERENCE_AUDIO_DIR,
         'output_audio_dir': OUTPUT_AUDIO_DIR,
-        'gemini_api_key_found': bool(get_gemini_api_key()), # Check if key is discoverable
+        # Only whether a key exists matters here, so the cached key list is enough
+        'gemini_api_key_found': bool(get_all_gemini_api_keys()), # Check if key is discoverable
     })
 
 @models_bp.route('/models', methods=['GET'])
@@ -225,7 +261,7 @@ def get_model_download_status(model_id):
         # Check if the model exists at all (even if not downloading)
         all_models = get_models(include_cache=True)
         model_exists = any(m['id'] == decoded_model_id for m in all_models.get('models', [])) or \
-                       any(m['id'] == decoded_model_id for m in all_models.get('cached_models', []))
+                       any(m['id'] == decoded_model_id for m in all_models.get('cache_models', []))
 
         if model_exists:
              # Model exists but no active download status found
@@ -252,6 +288,7 @@ def remove_model(model_id):
     success, message = delete_model(decoded_model_id, delete_cache)
 
     if success:
+        release_tts_model(decoded_model_id)
 
         return jsonify({'success': True, 'message': message})
     else:
@@ -275,6 +312,7 @@ def update_model(model_id):
     success, message = update_model_info(decoded_model_id, data)
 
     if success:
+        release_tts_model(decoded_model_id)
 
         return jsonify({'success': True, 'message': message})
     else:
@@ -1,40 +1,81 @@
 import os
+import gc
+import importlib.util
 import logging
-import torch
-from .narration_config import HAS_F5TTS, device
-
-# Import F5-TTS patch to enable custom config support
-from .f5tts_patch import patch_f5tts
+import threading
+from collections import OrderedDict
+from . import narration_config
 
 logger = logging.getLogger(__name__)
 
+# Prefer orjson for SSE events (C encoder, emits UTF-8 directly); fall back to the stdlib encoder
+try:
+    from orjson import dumps as json_bytes
+except ImportError:
+    from json import dumps as _json_dumps
+
+    def json_bytes(obj):
+        return _json_dumps(obj, ensure_ascii=False).encode()
+
+def sse_event(data):
+    """Encode one server-sent event as bytes"""
+    return b"data: " + json_bytes(data) + b"\n\n"
+
+# Loaded models stay resident between /generate requests, keyed by model ID, so a request doesn't
+# pay the checkpoint + vocoder load again. Weights are read-only during inference; per-request
+# settings (seed, nfe_step, ...) are passed per call. At most F5TTS_MAX_RESIDENT_MODELS (default 1,
+# to bound VRAM use) are loaded at once, counting models still used by a running request.
+# get_tts_model takes a reference that the request returns with put_tts_model; a model is only
+# unloaded once no request uses it, so a request for another model waits for a slot instead of
+# loading on top of weights that are still in use. A model being loaded holds its slot too; the
+# load itself runs outside the lock, so requests for resident models aren't held up by it.
+_MAX_RESIDENT_MODELS = max(1, int(os.environ.get('F5TTS_MAX_RESIDENT_MODELS', '1')))
+_resident_models = OrderedDict()  # model_id -> (tts_instance, loaded_model_id)
+_model_users = {}  # id(tts_instance) -> number of requests using it
+_retired_models = {}  # id(tts_instance) -> tts_instance, unloaded from the LRU but still in use
+_loading_models = set()  # model IDs whose load is in progress
+_stale_loads = set()  # loading model IDs released meanwhile; the loaded instance is not kept
+_resident_model_lock = threading.Lock()
+_model_released = threading.Condition(_resident_model_lock)
+
+# f5_tts.api is imported on the first model load (it pulls in torch, vocos, transformers, ...)
+_F5TTS = None
+
+def _f5tts_class():
+    """Lazily import and remember the F5TTS class, avoiding problematic dependencies at module load"""
+    global _F5TTS
+    if _F5TTS is None:
+        from f5_tts.api import F5TTS
+        _F5TTS = F5TTS
+    return _F5TTS
+
 def load_tts_model(model_id=None):
-    """Loads or retrieves the specified F5-TTS model."""
+    """
+    Loads the specified F5-TTS model; None loads the active model and "default" the built-in
+    F5-TTS checkpoint.
+    """
     # This function encapsulates model loading logic.
-    # Currently called within the /generate route per request.
-    if not HAS_F5TTS:
+    # The /generate route goes through get_tts_model, which keeps the result resident.
+    if not narration_config.init_f5tts():
         raise RuntimeError("F5-TTS is not available.")
+    device = narration_config.device
 
     try:
         # Lazy import to avoid triggering problematic dependencies at module load
-        from model_manager import get_models, get_active_model
+        from model_manager import get_active_model
 
         # Determine which model to load
         target_model_id = model_id or get_active_model()
-        logger.info(f"[DEBUG] load_tts_model called with model_id={model_id}, active_model={get_active_model()}, target_model_id={target_model_id}")
-        if not target_model_id:
+        logger.info(f"[DEBUG] load_tts_model called with model_id={model_id}, target_model_id={target_model_id}")
+        if not target_model_id or target_model_id == "default":
             logger.warning("No specific or active model set, attempting to load default F5-TTS model.")
-            # Lazy import F5TTS to avoid triggering problematic dependencies
-            from f5_tts.api import F5TTS
             # Initialize default F5-TTS
-            tts_instance = F5TTS(device=device)
+            tts_instance = _f5tts_class()(device=device)
 
             return tts_instance, "default" # Return instance and ID used
 
         # Find the model details from registry
-        model_registry = get_models(include_cache=True) # Check both installed and cache
-        all_known_models = model_registry.get('models', []) + model_registry.get('cached_models', [])
-        model_info = next((m for m in all_known_models if m['id'] == target_model_id), None)
+        model_info = _registry_index().get(target_model_id)
 
         if not model_info:
             logger.error(f"Model ID '{target_model_id}' not found in registry. Cannot load.")
@@ -45,9 +86,7 @@ def load_tts_model(model_id=None):
 
         # Handle the default model marker explicitly
         if model_info.get("source") == "default" or model_info.get("model_path") == "default":
-            # Lazy import F5TTS to avoid triggering problematic dependencies
-            from f5_tts.api import F5TTS
-            tts_instance = F5TTS(device=device)
+            tts_instance = _f5tts_class()(device=device)
         else:
             # Initialize with specific model paths
             model_path = model_info.get("model_path")
@@ -85,9 +124,7 @@ def load_tts_model(model_id=None):
                     config_dict=structured_config
                 )
             else:
-                # Lazy import F5TTS to avoid triggering problematic dependencies
-                from f5_tts.api import F5TTS
-                tts_instance = F5TTS(
+                tts_instance = _f5tts_class()(
                     device=device,
                     ckpt_file=model_path,
                     vocab_file=vocab_path # Pass None if vocab_path is None or empty
@@ -100,3 +137,154 @@ def load_tts_model(model_id=None):
         logger.exception(f"Error loading F5-TTS model (ID: {target_model_id if 'target_model_id' in locals() else 'unknown'}): {e}")
         # Re-raise a more specific error or handle appropriately
         raise RuntimeError(f"Failed to load TTS model '{target_model_id if 'target_model_id' in locals() else 'unknown'}': {str(e)}") from e
+
+def _registry_index():
+    """Map model ID -> registry entry for installed and Hugging Face cache models"""
+    from model_manager import get_models
+
+    model_registry = get_models(include_cache=True) # Check both installed and cache
+    index = {m['id']: m for m in model_registry.get('cache_models', [])}
+    # Installed entries win over cache entries with the same ID
+    index.update((m['id'], m) for m in model_registry.get('models', []))
+    return index
+
+def compile_tts_model(tts_instance):
+    """
+    Wrap the model's DiT transformer with torch.compile when F5TTS_TORCH_COMPILE is enabled.
+    Returns True if the instance was compiled by this call (its first inference will be slow).
+    """
+    if not narration_config.TORCH_COMPILE or not narration_config.device.startswith("cuda"):
+        return False
+    model = getattr(tts_instance, 'ema_model', None)
+    if model is None or getattr(model, '_narration_compiled', False):
+        return False
+
+    import torch
+    backend = narration_config.TORCH_COMPILE_BACKEND
+    if backend == 'tensorrt' and importlib.util.find_spec('torch_tensorrt') is None:
+        logger.warning("F5TTS_TORCH_COMPILE=tensorrt but torch_tensorrt is not installed; using inductor")
+        backend = 'inductor'
+    try:
+        # dynamic=True so varying text/duration lengths don't trigger a recompile per subtitle
+        if backend == 'tensorrt':
+            import torch_tensorrt  # noqa: F401  (registers the "torch_tensorrt" backend)
+            model.transformer = torch.compile(
+                model.transformer, backend="torch_tensorrt", dynamic=True,
+                options={"enabled_precisions": {torch.float16}}
+            )
+        else:
+            model.transformer = torch.compile(model.transformer, mode="reduce-overhead", dynamic=True)
+        model._narration_compiled = True
+        logger.info(f"Compiled F5-TTS transformer with torch.compile ({backend})")
+        return True
+    except Exception as e:
+        logger.warning(f"torch.compile unavailable, running the F5-TTS model eagerly: {e}")
+        return False
+
+def get_tts_model(model_id=None):
+    """
+    Return (tts_instance, model_id) for the requested or active model, reusing a resident one.
+    The caller must hand the instance back with put_tts_model when it is done with it.
+    """
+    from model_manager import get_active_model
+
+    wanted_id = model_id or get_active_model() or "default"
+    with _model_released:
+        while True:
+            resident = _resident_models.get(wanted_id)
+            if resident is not None:
+                _resident_models.move_to_end(wanted_id)
+                key = id(resident[0])
+                _model_users[key] = _model_users.get(key, 0) + 1
+                return resident
+
+            # Another request is already loading this model; wait for it instead of loading it twice
+            if wanted_id not in _loading_models:
+                # Make room by unloading idle models, least recently used first
+                for resident_id in list(_resident_models):
+                    if _occupied_slots() < _MAX_RESIDENT_MODELS:
+                        break
+                    if not _model_users.get(id(_resident_models[resident_id][0])):
+                        _release_resident_model(resident_id)
+
+                if _occupied_slots() < _MAX_RESIDENT_MODELS:
+                    _loading_models.add(wanted_id)
+                    break
+
+                # Every slot holds a model a running request still uses; wait for one to finish
+                logger.info(f"Waiting for running generations to finish before loading TTS model '{wanted_id}'")
+            _model_released.wait()
+
+    try:
+        # Return memory freed by unloaded models before the new weights are allocated
+        _free_model_memory()
+        # Load the ID the cache entry is keyed by; re-reading the active model could load another one
+        resident = load_tts_model(wanted_id)
+    except BaseException:
+        with _model_released:
+            _loading_models.discard(wanted_id)
+            _stale_loads.discard(wanted_id)
+            _model_released.notify_all()
+        raise
+
+    with _model_released:
+        _loading_models.discard(wanted_id)
+        if wanted_id in _stale_loads:
+            # Released (e.g. edited) while loading: serve this request, then drop it
+            _stale_loads.discard(wanted_id)
+            _retired_models[id(resident[0])] = resident[0]
+        else:
+            _resident_models[wanted_id] = resident
+        _model_users[id(resident[0])] = 1
+        _model_released.notify_all()
+    return resident
+
+def _occupied_slots():
+    """Resident, retired and loading models; caller holds _resident_model_lock"""
+    return len(_resident_models) + len(_retired_models) + len(_loading_models)
+
+def put_tts_model(tts_instance):
+    """Return a model taken with get_tts_model; a retired model is dropped with its last user."""
+    with _model_released:
+        key = id(tts_instance)
+        users = _model_users.get(key, 0) - 1
+        if users > 0:
+            _model_users[key] = users
+            return
+        _model_users.pop(key, None)
+        _retired_models.pop(key, None)
+        _model_released.notify_all()
+
+def release_tts_model(model_id=None):
+    """Unload a resident model (all of them when model_id is None), e.g. after it is deleted or edited."""
+    with _resident_model_lock:
+        model_ids = [model_id] if model_id is not None else [*_resident_models, *_loading_models]
+        for resident_id in model_ids:
+            if resident_id in _loading_models:
+                _stale_loads.add(resident_id)
+            _release_resident_model(resident_id)
+
+def _release_resident_model(model_id):
+    """
+    Drop a resident model; caller holds _resident_model_lock. A model that a running request still
+    uses is retired instead: new requests no longer get it, and it keeps its slot until put_tts_model
+    drops it. Its memory is returned before the next model load.
+    """
+    resident = _resident_models.pop(model_id, None)
+    if resident is None:
+        return
+    key = id(resident[0])
+    if _model_users.get(key):
+        logger.info(f"TTS model '{model_id}' will be unloaded when its running generations finish")
+        _retired_models[key] = resident[0]
+        return
+    logger.info(f"Unloading TTS model '{model_id}'")
+    del resident
+    _free_model_memory()
+
+def _free_model_memory():
+    """Collect dropped model objects and hand their cached CUDA blocks back to the driver"""
+    gc.collect()
+    if (narration_config.device or "").startswith("cuda"):
+        import torch
+        torch.cuda.empty_cache()
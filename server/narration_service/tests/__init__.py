@@ -0,0 +1,5 @@
+"""
+Tests for the narration service. Run from the server directory:
+
+    python -m unittest discover -s narration_service/tests -t .
+"""
@@ -0,0 +1,31 @@
+import unittest
+
+from flask import Flask
+
+from narration_service import narration_bp
+
+
+class JsonErrorTest(unittest.TestCase):
+    def setUp(self):
+        app = Flask(__name__)
+        app.register_blueprint(narration_bp, url_prefix='/api/narration')
+        self.client = app.test_client()
+
+    def test_http_errors_are_json(self):
+        # request.json raises UnsupportedMediaType without a JSON content type
+        response = self.client.post('/api/narration/models/active', data='model_id=x')
+
+        self.assertEqual(response.status_code, 415)
+        self.assertTrue(response.is_json)
+        self.assertIn('error', response.get_json())
+
+    def test_extract_segment_rejects_non_object_body(self):
+        for kwargs in ({'data': 'not json'}, {'json': ['video.mp4', 0, 1]}):
+            response = self.client.post('/api/narration/extract-segment', **kwargs)
+
+            self.assertEqual(response.status_code, 400)
+            self.assertTrue(response.is_json)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import sys
+import types
+import unittest
+from unittest import mock
+
+import torch
+
+from narration_service import f5tts_inference
+from narration_service.f5tts_inference import PreparedReference, estimate_duration, infer_batch
+
+HOP_LENGTH = 256
+SAMPLE_RATE = 24000
+N_MELS = 100
+
+
+def _fake_utils_infer():
+    """The parts of f5_tts.infer.utils_infer that infer_batch touches"""
+    utils_infer = types.SimpleNamespace(hop_length=HOP_LENGTH, convert_char_to_pinyin=lambda texts: texts)
+    infer = types.SimpleNamespace(utils_infer=utils_infer)
+    return {'f5_tts': types.SimpleNamespace(infer=infer), 'f5_tts.infer': infer,
+            'f5_tts.infer.utils_infer': utils_infer}
+
+
+def _fake_tts(mel_spec_type='vocos'):
+    def sample(cond, text, duration, **kwargs):
+        return torch.full((len(text), int(duration.max()), N_MELS), 0.5), None
+
+    tts = mock.Mock(device='cpu', target_sample_rate=SAMPLE_RATE, mel_spec_type=mel_spec_type)
+    tts.ema_model.sample.side_effect = sample
+    tts.vocoder.decode.side_effect = lambda mel: torch.full((1, mel.shape[-1] * HOP_LENGTH), 0.5)
+    return tts
+
+
+@unittest.skipUnless(hasattr(torch, 'randn'), 'needs PyTorch')
+class InferBatchTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(sys.modules, _fake_utils_infer())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Two seconds of reference audio, loud enough to skip RMS normalisation
+        self.reference = PreparedReference(torch.full((1, 2 * SAMPLE_RATE), 0.2), SAMPLE_RATE, 'Reference words.')
+
+    def test_one_wave_per_text(self):
+        tts = _fake_tts()
+
+        waves = infer_batch(tts, self.reference, ['Hello there.', 'A second line.'], seed=7)
+
+        self.assertEqual(len(waves), 2)
+        self.assertTrue(all(len(wave) for wave in waves))
+        tts.ema_model.sample.assert_called_once()
+
+    def test_seed_applies_to_every_row(self):
+        tts = _fake_tts()
+        long_text = 'word ' * 200  # Over the chunk budget, so it goes through infer_single
+
+        with mock.patch.object(f5tts_inference, 'infer_single', return_value='long wave') as infer_single:
+            waves = infer_batch(tts, self.reference, ['Hello there.', long_text, 'Bye.'], seed=7)
+
+        # model.sample reseeds before each row's noise; the long text is seeded on its own
+        self.assertEqual(tts.ema_model.sample.call_args.kwargs['seed'], 7)
+        self.assertEqual(len(tts.ema_model.sample.call_args.kwargs['text']), 2)
+        self.assertEqual(infer_single.call_args.kwargs['seed'], 7)
+        self.assertEqual(waves[1], 'long wave')
+
+    def test_unknown_vocoder_fails_before_sampling(self):
+        tts = _fake_tts(mel_spec_type='hifigan')
+
+        with self.assertRaisesRegex(ValueError, 'hifigan'):
+            infer_batch(tts, self.reference, ['Hello there.', 'A second line.'])
+        tts.ema_model.sample.assert_not_called()
+
+
+class EstimateDurationTest(unittest.TestCase):
+    def test_fixed_duration(self):
+        self.assertEqual(estimate_duration(100, 'ref', 'gen', 1.0, 2.0, SAMPLE_RATE, HOP_LENGTH),
+                         2 * SAMPLE_RATE // HOP_LENGTH)
+
+    def test_short_texts_get_a_minimum_length(self):
+        self.assertEqual(estimate_duration(100, 'reference text', 'Hi', 1.0, None, SAMPLE_RATE, HOP_LENGTH),
+                         100 + 150)
+
+    def test_scales_with_text_length_and_speed(self):
+        ref_text = 'r' * 100
+        slow = estimate_duration(1000, ref_text, 'g' * 200, 1.0, None, SAMPLE_RATE, HOP_LENGTH)
+        fast = estimate_duration(1000, ref_text, 'g' * 200, 2.0, None, SAMPLE_RATE, HOP_LENGTH)
+
+        self.assertEqual(slow, 1000 + int(1000 / 100 * 200 * 1.5))
+        self.assertLess(fast, slow)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from narration_service import directory_utils, f5tts_inference, narration_generation
+
+
+class FakeModel:
+    def export_wav(self, wave, file_wave, remove_silence):
+        with open(file_wave, 'wb') as f:
+            f.write(b'RIFF')
+
+
+class GenerationReleaseTest(unittest.TestCase):
+    """The route hands its model back only once no inference of the request still runs on it"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.reference_audio = os.path.join(self.root, 'reference.wav')
+        with open(self.reference_audio, 'wb') as f:
+            f.write(b'RIFF')
+
+        self.model = FakeModel()
+        self.returned = threading.Event()
+        self.batch_started = threading.Event()
+        self.finish_batch = threading.Event()
+        self.batches = []
+
+        def infer_batch(tts, reference, gen_texts, **kwargs):
+            self.batches.append(gen_texts)
+            self.batch_started.set()
+            self.finish_batch.wait(5)
+            return ['wave'] * len(gen_texts)
+
+        for target, name, value in (
+                (directory_utils, 'OUTPUT_AUDIO_DIR', os.path.join(self.root, 'output')),
+                (narration_generation, 'get_tts_model', lambda model_id=None: (self.model, 'model-a')),
+                (narration_generation, 'put_tts_model', lambda model: self.returned.set()),
+                (f5tts_inference, 'prepare_reference', lambda ref_file, ref_text: object()),
+                (f5tts_inference, 'infer_batch', infer_batch)):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.finish_batch.set)
+
+        app = Flask(__name__)
+        app.register_blueprint(narration_generation.generation_bp)
+        self.client = app.test_client()
+
+    def _generate(self):
+        subtitles = [{'id': k, 'text': f'line {k}'} for k in range(6)]
+        return self.client.post('/generate', buffered=False, json={
+            'reference_audio': self.reference_audio, 'subtitles': subtitles, 'settings': {'batchSize': 3}
+        })
+
+    def test_model_is_returned_after_a_finished_stream(self):
+        self.finish_batch.set()
+        response = self._generate()
+
+        self.assertIn(b'"type":"complete"', response.get_data().replace(b' ', b''))
+        response.close()
+        self.assertTrue(self.returned.is_set())
+
+    def test_disconnect_waits_for_the_running_batch(self):
+        response = self._generate()
+        for _ in response.response:
+            if self.batch_started.is_set():
+                break
+
+        response.close()  # The client goes away while the first batch is on the GPU
+        self.assertFalse(self.returned.is_set())
+
+        self.finish_batch.set()
+        self.assertTrue(self.returned.wait(5))
+        # The queued second batch was cancelled rather than run for nobody
+        self.assertEqual(len(self.batches), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
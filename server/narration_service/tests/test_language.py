@@ -0,0 +1,25 @@
+import unittest
+
+from narration_service.narration_language import is_text_english
+
+
+class IsTextEnglishTest(unittest.TestCase):
+    def test_english(self):
+        self.assertTrue(is_text_english('This is the voice that we will use for the narration.'))
+        self.assertTrue(is_text_english(''))
+
+    def test_vietnamese_is_not_english(self):
+        # Splitting on accented letters used to leave fragments like "i" that count as English
+        self.assertFalse(is_text_english('Xin chào thế giới'))
+        self.assertFalse(is_text_english('Tôi là một người Việt Nam và tôi yêu quê hương'))
+
+    def test_french_is_not_english(self):
+        self.assertFalse(is_text_english("Je suis allé à la plage avec mes amis"))
+        self.assertFalse(is_text_english("C'était déjà l'été à Paris, où nous étions"))
+
+    def test_mostly_non_latin_text_is_not_english(self):
+        self.assertFalse(is_text_english('Привет, как дела?'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from narration_service import directory_utils, narration_bp
+
+
+class MissingAudioCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory_utils.clear_missing_audio()
+        self.addCleanup(directory_utils.clear_missing_audio)
+
+    def test_entries_expire_after_ttl(self):
+        with mock.patch.object(directory_utils.time, 'monotonic', return_value=100.0):
+            directory_utils.mark_audio_missing('subtitle_1/1.wav')
+            self.assertTrue(directory_utils.is_audio_known_missing('subtitle_1/1.wav'))
+        later = 100.0 + directory_utils._MISSING_AUDIO_TTL + 0.1
+        with mock.patch.object(directory_utils.time, 'monotonic', return_value=later):
+            self.assertFalse(directory_utils.is_audio_known_missing('subtitle_1/1.wav'))
+
+    def test_size_is_bounded(self):
+        with mock.patch.object(directory_utils, '_MISSING_AUDIO_MAX', 2):
+            for name in ('a.wav', 'b.wav', 'c.wav'):
+                directory_utils.mark_audio_missing(name)
+            self.assertFalse(directory_utils.is_audio_known_missing('a.wav'))
+            self.assertTrue(directory_utils.is_audio_known_missing('c.wav'))
+
+    def test_clear_forgets_misses(self):
+        directory_utils.mark_audio_missing('a.wav')
+        directory_utils.clear_missing_audio()
+        self.assertFalse(directory_utils.is_audio_known_missing('a.wav'))
+
+    def test_audio_route_remembers_a_miss(self):
+        app = Flask(__name__)
+        app.register_blueprint(narration_bp, url_prefix='/api/narration')
+        client = app.test_client()
+
+        response = client.get('/api/narration/audio/subtitle_0/does_not_exist.wav')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(directory_utils.is_audio_known_missing('subtitle_0/does_not_exist.wav'))
+        with mock.patch('os.path.realpath') as realpath:
+            self.assertEqual(client.get('/api/narration/audio/subtitle_0/does_not_exist.wav').status_code, 404)
+        realpath.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
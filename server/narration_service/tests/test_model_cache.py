@@ -0,0 +1,154 @@
+import threading
+import time
+import unittest
+from collections import OrderedDict
+from unittest import mock
+
+import model_manager
+from narration_service import narration_utils
+
+
+class FakeModel:
+    def __init__(self, model_id):
+        self.model_id = model_id
+
+
+class ModelCacheTest(unittest.TestCase):
+    def setUp(self):
+        for name, value in (('_MAX_RESIDENT_MODELS', 1), ('_resident_models', OrderedDict()),
+                            ('_model_users', {}), ('_retired_models', {}), ('_loading_models', set()),
+                            ('_stale_loads', set()), ('_free_model_memory', lambda: None)):
+            patcher = mock.patch.object(narration_utils, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(model_manager, 'get_active_model', return_value='model-a')
+        self.get_active_model = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(narration_utils, 'load_tts_model',
+                                    side_effect=lambda model_id: (FakeModel(model_id), model_id))
+        self.load = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get_in_thread(self, model_id):
+        """Start get_tts_model(model_id) on a thread; returns (thread, result list)"""
+        result = []
+        thread = threading.Thread(target=lambda: result.append(narration_utils.get_tts_model(model_id)),
+                                  daemon=True)
+        thread.start()
+        return thread, result
+
+    def test_resident_model_is_shared_and_counted(self):
+        first, _ = narration_utils.get_tts_model('model-a')
+        second, _ = narration_utils.get_tts_model('model-a')
+
+        self.assertIs(first, second)
+        self.load.assert_called_once_with('model-a')
+        self.assertEqual(narration_utils._model_users[id(first)], 2)
+        narration_utils.put_tts_model(first)
+        narration_utils.put_tts_model(second)
+        self.assertNotIn(id(first), narration_utils._model_users)
+        self.assertIn('model-a', narration_utils._resident_models)
+
+    def test_loads_the_id_it_caches_under(self):
+        model_a, _ = narration_utils.get_tts_model()
+        self.load.assert_called_once_with('model-a')
+        narration_utils.put_tts_model(model_a)
+
+        self.get_active_model.return_value = None
+        model, loaded_id = narration_utils.get_tts_model()
+        self.assertEqual(loaded_id, 'default')
+        self.assertIs(narration_utils._resident_models['default'][0], model)
+
+    def test_switch_waits_until_the_model_in_use_is_returned(self):
+        model_a, _ = narration_utils.get_tts_model('model-a')
+
+        thread, result = self._get_in_thread('model-b')
+        time.sleep(0.1)
+        self.assertEqual(result, [])
+        self.assertEqual(self.load.call_count, 1)
+
+        narration_utils.put_tts_model(model_a)
+        thread.join(5)
+        self.assertEqual(result[0][1], 'model-b')
+        self.assertEqual(list(narration_utils._resident_models), ['model-b'])
+
+    def test_load_runs_outside_the_lock(self):
+        narration_utils._MAX_RESIDENT_MODELS = 2
+        resident_b, _ = narration_utils.get_tts_model('model-b')
+        narration_utils.put_tts_model(resident_b)
+        loading = threading.Event()
+        finish_load = threading.Event()
+
+        def slow_load(model_id):
+            loading.set()
+            finish_load.wait(5)
+            return FakeModel(model_id), model_id
+
+        self.load.side_effect = slow_load
+        loader, loaded = self._get_in_thread('model-a')
+        self.assertTrue(loading.wait(5))
+
+        # A resident model is handed out while model-a loads; a second request for model-a waits
+        self.assertIs(narration_utils.get_tts_model('model-b')[0], resident_b)
+        waiter, waited = self._get_in_thread('model-a')
+        time.sleep(0.1)
+        self.assertEqual(waited, [])
+
+        finish_load.set()
+        loader.join(5)
+        waiter.join(5)
+        self.assertIs(loaded[0][0], waited[0][0])
+        self.assertEqual(self.load.call_count, 2)  # model-b, then model-a once
+        self.assertEqual(narration_utils._model_users[id(loaded[0][0])], 2)
+
+    def test_failed_load_frees_its_slot(self):
+        self.load.side_effect = RuntimeError('bad checkpoint')
+
+        with self.assertRaises(RuntimeError):
+            narration_utils.get_tts_model('model-a')
+        self.assertEqual(narration_utils._loading_models, set())
+
+        self.load.side_effect = lambda model_id: (FakeModel(model_id), model_id)
+        self.assertEqual(narration_utils.get_tts_model('model-a')[1], 'model-a')
+
+    def test_released_model_in_use_is_retired_until_returned(self):
+        model_a, _ = narration_utils.get_tts_model('model-a')
+
+        narration_utils.release_tts_model('model-a')
+        self.assertNotIn('model-a', narration_utils._resident_models)
+        self.assertIn(id(model_a), narration_utils._retired_models)
+
+        # The retired model keeps its slot, so the next load waits for it
+        thread, result = self._get_in_thread('model-a')
+        time.sleep(0.1)
+        self.assertEqual(result, [])
+        narration_utils.put_tts_model(model_a)
+        thread.join(5)
+        self.assertEqual(narration_utils._retired_models, {})
+        self.assertIsNot(result[0][0], model_a)
+
+    def test_release_during_load_drops_the_loaded_model(self):
+        loading = threading.Event()
+        finish_load = threading.Event()
+
+        def slow_load(model_id):
+            loading.set()
+            finish_load.wait(5)
+            return FakeModel(model_id), model_id
+
+        self.load.side_effect = slow_load
+        thread, result = self._get_in_thread('model-a')
+        self.assertTrue(loading.wait(5))
+        narration_utils.release_tts_model('model-a')
+        finish_load.set()
+        thread.join(5)
+
+        model = result[0][0]
+        self.assertNotIn('model-a', narration_utils._resident_models)
+        self.assertIn(id(model), narration_utils._retired_models)
+        narration_utils.put_tts_model(model)
+        self.assertEqual(narration_utils._retired_models, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+from narration_service.narration_audio import _parse_time
+
+
+class ParseTimeTest(unittest.TestCase):
+    def test_numbers_pass_through(self):
+        self.assertEqual(_parse_time(5), 5.0)
+        self.assertEqual(_parse_time(1.25), 1.25)
+
+    def test_clock_formats(self):
+        self.assertEqual(_parse_time('01:02:03.5'), 3723.5)
+        self.assertEqual(_parse_time('02:03.25'), 123.25)
+        self.assertEqual(_parse_time(' 7.5 '), 7.5)
+        self.assertEqual(_parse_time('3.'), 3.0)
+
+    def test_float_strings_outside_the_clock_format(self):
+        self.assertEqual(_parse_time('-1.5'), -1.5)
+        self.assertEqual(_parse_time('1e2'), 100.0)
+
+    def test_rejects_invalid_values(self):
+        for value in ('1:2:3:4', 'abc', '', '12:'):
+            with self.assertRaises(ValueError):
+                _parse_time(value)
+        with self.assertRaises(ValueError):
+            _parse_time(None)
+
+
+if __name__ == '__main__':
+    unittest.main()
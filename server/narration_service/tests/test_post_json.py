@@ -0,0 +1,71 @@
+import unittest
+from unittest import mock
+
+import urllib3
+
+from narration_service import narration_gemini
+
+
+def _response(status, data=b'{}', retry_after=None):
+    headers = {'Retry-After': retry_after} if retry_after is not None else {}
+    return mock.Mock(status=status, data=data, headers=headers)
+
+
+class PostJsonTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(narration_gemini._pool, 'request')
+        self.request = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(narration_gemini.time, 'sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _post(self, timeout=30):
+        return narration_gemini.post_json('https://example.invalid/v1', {'a': 1}, {}, timeout)
+
+    def test_server_error_then_success(self):
+        self.request.side_effect = [_response(503), _response(200, b'{"ok": true}')]
+
+        self.assertEqual(self._post(), (200, b'{"ok": true}'))
+        self.assertEqual(self.request.call_count, 2)
+        self.sleep.assert_called_once_with(narration_gemini._BACKOFF_FACTOR)
+        # urllib3's own retries stay off; the loop above does the retrying
+        self.assertIs(self.request.call_args.kwargs['retries'], False)
+
+    def test_rate_limit_is_returned_at_once(self):
+        self.request.return_value = _response(429)
+
+        self.assertEqual(self._post()[0], 429)
+        self.assertEqual(self.request.call_count, 1)
+        self.sleep.assert_not_called()
+
+    def test_connect_timeout_is_retried(self):
+        self.request.side_effect = [urllib3.exceptions.ConnectTimeoutError('connect timed out'),
+                                    _response(200)]
+
+        self.assertEqual(self._post()[0], 200)
+        self.assertEqual(self.request.call_count, 2)
+
+    def test_connect_timeout_raises_after_max_retries(self):
+        self.request.side_effect = urllib3.exceptions.ConnectTimeoutError('connect timed out')
+
+        with self.assertRaises(urllib3.exceptions.ConnectTimeoutError):
+            self._post()
+        self.assertEqual(self.request.call_count, narration_gemini._MAX_RETRIES + 1)
+
+    def test_retry_after_past_deadline_returns_response(self):
+        self.request.return_value = _response(503, retry_after='60')
+
+        self.assertEqual(self._post(timeout=10)[0], 503)
+        self.assertEqual(self.request.call_count, 1)
+        self.sleep.assert_not_called()
+
+    def test_retry_after_within_deadline_is_honoured(self):
+        self.request.side_effect = [_response(503, retry_after='2'), _response(200)]
+
+        self.assertEqual(self._post(timeout=10)[0], 200)
+        self.sleep.assert_called_once_with(2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import base64
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from werkzeug.datastructures import FileStorage
+
+from narration_service import narration_audio
+
+# First bytes of an .m4a (ISO BMFF 'ftyp' box) and of a RIFF/WAVE file
+MP4_HEAD = b'\x00\x00\x00\x20ftypM4A \x00\x00\x00\x00'
+WAV_HEAD = b'RIFF\x24\x00\x00\x00WAVEfmt '
+
+
+class PersistReferenceTest(unittest.TestCase):
+    def setUp(self):
+        self.reference_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.reference_dir)
+        patcher = mock.patch.object(narration_audio, 'REFERENCE_AUDIO_DIR', self.reference_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _persist(self, audio_source, ext='.wav'):
+        with mock.patch.object(narration_audio, 'add_silence_to_audio', return_value=True) as from_file, \
+                mock.patch.object(narration_audio, 'add_silence_to_audio_stream',
+                                  return_value=True) as from_pipe:
+            narration_audio._persist_reference(audio_source, 'test', 'hello there', ext)
+        return from_file, from_pipe
+
+    def test_mp4_upload_named_wav_goes_through_temp_file(self):
+        payload = MP4_HEAD + b'moov' * 64
+        upload = FileStorage(io.BytesIO(payload), filename='recorded_audio.wav')
+
+        from_file, from_pipe = self._persist(upload)
+
+        from_pipe.assert_not_called()
+        temp_filepath = from_file.call_args[0][0]
+        self.assertTrue(os.path.basename(temp_filepath).startswith('temp_test_'))
+        # Only the padded output remains once ffmpeg succeeds
+        self.assertFalse(os.path.exists(temp_filepath))
+
+    def test_mp4_base64_goes_through_temp_file(self):
+        from_file, from_pipe = self._persist(base64.b64encode(MP4_HEAD + b'\x00' * 32).decode())
+
+        from_pipe.assert_not_called()
+        from_file.assert_called_once()
+
+    def test_wav_is_piped_even_with_mp4_extension(self):
+        upload = FileStorage(io.BytesIO(WAV_HEAD + b'\x00' * 32), filename='clip.m4a')
+
+        from_file, from_pipe = self._persist(upload, '.m4a')
+
+        from_file.assert_not_called()
+        self.assertEqual(b''.join(from_pipe.call_args[0][0]), WAV_HEAD + b'\x00' * 32)
+
+    def test_short_payload_is_piped(self):
+        from_file, from_pipe = self._persist(b'RIFF')
+
+        from_file.assert_not_called()
+        from_pipe.assert_called_once()
+
+
+class IterBase64ChunksTest(unittest.TestCase):
+    def test_slices_decode_to_the_whole_payload(self):
+        payload = os.urandom(narration_audio._B64_CHUNK_CHARS)  # Encodes to several slices
+        chunks = list(narration_audio.iter_base64_chunks(base64.b64encode(payload).decode()))
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b''.join(chunks), payload)
+
+    def test_empty_string_yields_nothing(self):
+        self.assertEqual(list(narration_audio.iter_base64_chunks('')), [])
+
+    def test_invalid_characters_raise(self):
+        with self.assertRaises(base64.binascii.Error):
+            list(narration_audio.iter_base64_chunks('QUJD!!!!'))
+
+
+class SavePaddedFallbackTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.filepath = os.path.join(self.root, 'recorded_b64_test.wav')
+
+    def test_invalid_base64_leaves_no_partial_file(self):
+        # The first slice decodes, the second doesn't
+        audio_data = 'A' * narration_audio._B64_CHUNK_CHARS + '!!!!'
+        with mock.patch.object(narration_audio, 'add_silence_to_audio_stream', return_value=False):
+            with self.assertRaises(base64.binascii.Error):
+                narration_audio.save_padded_base64(audio_data, self.filepath)
+        self.assertFalse(os.path.exists(self.filepath))
+
+    def test_fallback_writes_unpadded_audio(self):
+        with mock.patch.object(narration_audio, 'add_silence_to_audio_stream', return_value=False):
+            narration_audio.save_padded_audio(WAV_HEAD, self.filepath)
+        with open(self.filepath, 'rb') as f:
+            self.assertEqual(f.read(), WAV_HEAD)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from narration_service import narration_config
+
+
+class ReferenceTmpfsTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        shm_root = os.path.join(self.root, 'shm')
+        os.mkdir(shm_root)
+        self.reference_dir = os.path.join(self.root, 'narration', 'reference')
+        self.shm_reference_dir = os.path.join(shm_root, 'narration_refs')
+        os.makedirs(os.path.dirname(self.reference_dir))
+        for name, value in (('SHM_ROOT', shm_root), ('SHM_REFERENCE_DIR', self.shm_reference_dir),
+                            ('REFERENCE_AUDIO_DIR', self.reference_dir)):
+            patcher = mock.patch.object(narration_config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_links_reference_dir_into_tmpfs(self):
+        self.assertTrue(narration_config._prepare_reference_dir(True))
+        self.assertTrue(os.path.islink(self.reference_dir))
+        self.assertTrue(os.path.isdir(self.shm_reference_dir))
+
+    def test_recreates_tmpfs_target_after_reboot(self):
+        narration_config._prepare_reference_dir(True)
+        # A reboot empties tmpfs and leaves the link dangling
+        shutil.rmtree(self.shm_reference_dir)
+
+        self.assertTrue(narration_config._prepare_reference_dir(True))
+        self.assertTrue(os.path.islink(self.reference_dir))
+        self.assertTrue(os.path.isdir(self.reference_dir))
+
+    def test_dangling_link_becomes_plain_dir_without_tmpfs(self):
+        narration_config._prepare_reference_dir(True)
+        shutil.rmtree(self.shm_reference_dir)
+
+        self.assertFalse(narration_config._prepare_reference_dir(False))
+        self.assertFalse(os.path.islink(self.reference_dir))
+        self.assertTrue(os.path.isdir(self.reference_dir))
+
+    def test_touch_reference_audio_refreshes_mtime_on_tmpfs_only(self):
+        narration_config._prepare_reference_dir(True)
+        clip = os.path.join(self.reference_dir, 'clip.wav')
+        outside = os.path.join(self.root, 'outside.wav')
+        for path in (clip, outside):
+            open(path, 'wb').close()
+            os.utime(path, (0, 0))
+
+        with mock.patch.object(narration_config, 'REFERENCE_ON_TMPFS', True):
+            narration_config.touch_reference_audio(clip)
+            narration_config.touch_reference_audio(outside)
+        self.assertGreater(os.path.getmtime(clip), time.time() - 60)
+        self.assertEqual(os.path.getmtime(outside), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()